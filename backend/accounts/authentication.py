@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.tokens import GROUPS_CLAIM
+
+
+class LazyTokenUser(TokenUser):
+    """
+    User built from access token claims, returned by
+    ``JWTStatelessUserAuthentication`` (see SIMPLE_JWT["TOKEN_USER_CLASS"]).
+    Anything not carried by the token is read from the ``accounts.User``
+    row, loaded on first access.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def user_name(self):
+        return self.token.get("user_name", "")
+
+    @cached_property
+    def group_names(self):
+        return list(self.token.get(GROUPS_CLAIM, []))
+
+    @cached_property
+    def instance(self):
+        User = get_user_model()
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+    @property
+    def groups(self):
+        return self.instance.groups
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "token":
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return self.email
+
+    def __eq__(self, other):
+        if isinstance(other, TokenUser):
+            return self.id == other.id
+        if isinstance(other, Model):
+            return (
+                other._meta.concrete_model is get_user_model()
+                and other.pk == self.id
+            )
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self.id)
+
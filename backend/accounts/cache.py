@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+MISSING = object()
+
+DEFAULTS = {
+    "TIMEOUT": 300,
+    "MAX_ENTRIES": 10000,
+    # alias from CACHES shared by all processes, or None for process-local
+    # only; MAX_ENTRIES bounds the process-local cache
+    "SHARED_CACHE": None,
+}
+
+
+class LRUCache:
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return MISSING
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class PermissionCache:
+    """
+    Resolved permissions per user, in a process-local LRU when there is a
+    single process, or in the shared cache when several processes must
+    see each other's invalidations. The two are never layered: a local
+    copy in front of the shared cache would outlive an invalidation made
+    by another process.
+    """
+
+    key_prefix = "accounts:perms"
+
+    def __init__(self, options=None):
+        options = {**DEFAULTS, **(options or {})}
+        self.timeout = options["TIMEOUT"]
+        self.local = LRUCache(options["MAX_ENTRIES"], self.timeout)
+        self.shared_alias = options["SHARED_CACHE"]
+
+    @property
+    def shared(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    def _generation(self):
+        return self.shared.get_or_set(f"{self.key_prefix}:generation", 1, None)
+
+    def _shared_key(self, user_id):
+        return f"{self.key_prefix}:{self._generation()}:{user_id}"
+
+    def get(self, user_id, loader):
+        shared = self.shared
+        if shared is None:
+            value = self.local.get(user_id)
+            if value is MISSING:
+                value = loader()
+                self.local.set(user_id, value)
+            return value
+
+        key = self._shared_key(user_id)
+        value = shared.get(key)
+        if value is None:
+            value = loader()
+            shared.set(key, value, self.timeout)
+        return value
+
+    def invalidate_user(self, user_id):
+        if self.shared is None:
+            self.local.delete(user_id)
+        else:
+            self.shared.delete(self._shared_key(user_id))
+
+    def invalidate_all(self):
+        if self.shared is None:
+            self.local.clear()
+            return
+
+        key = f"{self.key_prefix}:generation"
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.set(key, 2, None)
+
+
+permission_cache = PermissionCache(getattr(settings, "PERMISSION_CACHE", None))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_instructorrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='permission_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -26,12 +26,34 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     user_name = models.CharField(max_length=150, default='user')
     date_joined = models.DateTimeField(auto_now_add=True)
+    # bumped whenever the user's effective permissions change; access
+    # tokens carry the version they were issued with
+    permission_version = models.PositiveIntegerField(default=1, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['user_name']
 
     objects = UserManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets accounts.signals spot changes to the flags stamped in tokens
+        instance._tracked_flags = (
+            instance.__dict__.get("is_staff"), instance.__dict__.get("is_superuser")
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        # permission_version is only ever changed with F() updates; never
+        # write back a possibly stale in-memory copy
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "permission_version"
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.email
 
@@ -56,8 +78,6 @@ class GroupPermission(models.Model):
     
     def __str__(self):
         return f"{self.group.name} -> {self.permission.code}"
-# connect signals
-# import accounts.signals
 
 
 class InstructorRequest(models.Model):
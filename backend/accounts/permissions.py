@@ -0,0 +1,44 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from accounts.tokens import PERMISSIONS_CLAIM, token_is_current
+
+
+class HasTokenPermission(BasePermission):
+    """
+    Authorizes from the permission claims signed into the access token.
+    Views declare the code they need as ``required_permission`` and may
+    override the error with ``permission_denied_message``.
+    """
+
+    message = "You do not have permission to perform this action."
+
+    def has_permission(self, request, view):
+        token = request.auth
+        if token is None:
+            return False
+
+        if not token_is_current(token):
+            raise AuthenticationFailed(
+                "Your permissions have changed, please log in again.",
+                code="token_stale",
+            )
+
+        self.message = getattr(view, "permission_denied_message", self.message)
+
+        required = getattr(view, "required_permission", None)
+        if required is None:
+            return True
+        return required in token.get(PERMISSIONS_CLAIM, [])
+
+
+class IsTokenStaff(HasTokenPermission):
+    """
+    IsAdminUser for stateless tokens: the token's is_staff claim counts
+    only while the token is current, so demoted staff lose access at once.
+    """
+
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        return bool(request.user and request.user.is_staff)
@@ -24,10 +24,13 @@ class RegisterSerializer(serializers.ModelSerializer):
     
 
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from accounts.tokens import PermissionRefreshToken
 from accounts.utils import get_user_permission_ids
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = PermissionRefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         user = self.user
@@ -40,6 +43,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         }
 
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = PermissionRefreshToken
     
 
 
@@ -0,0 +1,69 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.cache import permission_cache
+from accounts.models import GroupPermission, Permission, User
+from accounts.utils import bump_permission_version
+
+Membership = User.groups.through
+
+
+@receiver(m2m_changed, sender=Membership)
+def invalidate_on_group_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # group.user_set.clear() does not report which users were affected
+        bump_permission_version(
+            Membership.objects.filter(group=instance).values("user_id")
+        )
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    # invalidate after commit so a concurrent request cannot re-cache the
+    # rows this transaction is about to replace
+    if not reverse:
+        # user.groups.add(...) / remove / clear
+        bump_permission_version([instance.pk])
+        transaction.on_commit(partial(permission_cache.invalidate_user, instance.pk))
+    elif pk_set:
+        # group.user_set.add(...) / remove
+        bump_permission_version(pk_set)
+        for user_id in pk_set:
+            transaction.on_commit(partial(permission_cache.invalidate_user, user_id))
+    else:
+        transaction.on_commit(permission_cache.invalidate_all)
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_staff_change(sender, instance, created, **kwargs):
+    # tokens carry is_staff and is_superuser claims too
+    previous = getattr(instance, "_tracked_flags", None)
+    current = (instance.is_staff, instance.is_superuser)
+    if not created and previous is not None and previous != current:
+        bump_permission_version([instance.pk])
+        transaction.on_commit(partial(permission_cache.invalidate_user, instance.pk))
+    instance._tracked_flags = current
+
+
+@receiver(post_save, sender=GroupPermission)
+@receiver(post_delete, sender=GroupPermission)
+def invalidate_on_group_permission_change(sender, instance, **kwargs):
+    bump_permission_version(
+        Membership.objects.filter(group_id=instance.group_id).values("user_id")
+    )
+    transaction.on_commit(permission_cache.invalidate_all)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_on_permission_change(sender, instance, **kwargs):
+    bump_permission_version(
+        Membership.objects.filter(
+            group__grouppermission__permission_id=instance.pk
+        ).values("user_id")
+    )
+    transaction.on_commit(permission_cache.invalidate_all)
@@ -1,3 +1,137 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+
+from accounts import urls
+from accounts.cache import PermissionCache, permission_cache
+from accounts.models import User
+from accounts.tokens import PermissionRefreshToken, token_is_current
+from backend.query_budget import QueryBudgetTestMixin
+from courses.models import Course, Enrollment
+
+
+class AccountBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """Runs every accounts endpoint against its query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("setup_roles", verbosity=0, stdout=io.StringIO())
+
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw12345!x"
+        )
+        cls.student.groups.add(Group.objects.get(name="Student"))
+
+    def setUp(self):
+        caches["default"].clear()
+        permission_cache.invalidate_all()
+
+    def test_all_views_budgeted(self):
+        self.assertAllViewsBudgeted(urls.urlpatterns)
+
+    def test_register(self):
+        response = self.assertWithinBudget(
+            "post",
+            "/api/accounts/register/",
+            data={"email": "new@example.com", "user_name": "new", "password": "pw12345!x"},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_and_refresh(self):
+        response = self.assertWithinBudget(
+            "post",
+            "/api/accounts/login/",
+            data={"email": "student@example.com", "password": "pw12345!x"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.assertWithinBudget(
+            "post", "/api/accounts/token/refresh/", data={"refresh": response.data["refresh"]}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_instructor_request(self):
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = self.assertWithinBudget(
+            "post", "/api/accounts/instructor-request/", data={"message": "Let me teach"}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinBudget(
+            "post", "/api/accounts/instructor-request/", data={"message": "Again"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TokenPermissionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("setup_roles", verbosity=0, stdout=io.StringIO())
+
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw12345!x"
+        )
+        cls.student.groups.add(Group.objects.get(name="Student"))
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw12345!x"
+        )
+        cls.course = Course.objects.create(
+            creator=instructor, title="Python", description="", is_published=True
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+        permission_cache.invalidate_all()
+
+    def enroll(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.client.post(f"/api/courses/{self.course.pk}/enroll/")
+
+    def test_role_change_makes_tokens_stale(self):
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        self.assertTrue(token_is_current(token))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.groups.clear()
+
+        self.assertFalse(token_is_current(token))
+        response = self.enroll(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["detail"].code, "token_stale")
+
+        # a fresh token is current but no longer carries the permission
+        response = self.enroll(PermissionRefreshToken.for_user(self.student).access_token)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Enrollment.objects.exists())
+
+
+class PermissionCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_shared_invalidation_reaches_other_processes(self):
+        # two processes sharing one cache
+        first, second = (PermissionCache({"SHARED_CACHE": "default"}) for _ in range(2))
+        self.assertEqual(first.get(1, lambda: ["old"]), ["old"])
+        self.assertEqual(second.get(1, lambda: ["unused"]), ["old"])
+
+        second.invalidate_user(1)
+        self.assertEqual(first.get(1, lambda: ["new"]), ["new"])
+
+        second.invalidate_all()
+        self.assertEqual(first.get(1, lambda: ["newer"]), ["newer"])
+
+    def test_local_only(self):
+        cache = PermissionCache({"MAX_ENTRIES": 1})
+        self.assertEqual(cache.get(1, lambda: ["a"]), ["a"])
+        self.assertEqual(cache.get(1, lambda: ["unused"]), ["a"])
+        cache.get(2, lambda: ["b"])
+        # user 1 was evicted
+        self.assertEqual(cache.get(1, lambda: ["c"]), ["c"])
+        cache.invalidate_user(1)
+        self.assertEqual(cache.get(1, lambda: ["d"]), ["d"])
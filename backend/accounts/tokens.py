@@ -0,0 +1,54 @@
+from django.contrib.auth.models import Group
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.utils import get_permission_state
+
+PERMISSIONS_CLAIM = "perms"
+PERMISSION_VERSION_CLAIM = "perm_ver"
+GROUPS_CLAIM = "groups"
+
+
+def stamp_identity(token, user):
+    token["email"] = user.email
+    token["user_name"] = user.user_name
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+
+
+def stamp_groups(token, user_id):
+    token[GROUPS_CLAIM] = sorted(
+        Group.objects.filter(user__id=user_id).values_list("name", flat=True)
+    )
+
+
+def stamp_permissions(token, user_id):
+    version, codes = get_permission_state(user_id)
+    token[PERMISSIONS_CLAIM] = sorted(codes)
+    token[PERMISSION_VERSION_CLAIM] = version
+
+
+def token_is_current(token):
+    if PERMISSION_VERSION_CLAIM not in token:
+        return False
+    version, _ = get_permission_state(token[api_settings.USER_ID_CLAIM])
+    return token[PERMISSION_VERSION_CLAIM] == version
+
+
+class PermissionRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        stamp_identity(token, user)
+        stamp_permissions(token, user.pk)
+        stamp_groups(token, user.pk)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        # re-read so that refreshing picks up role changes
+        user_id = self[api_settings.USER_ID_CLAIM]
+        stamp_permissions(access, user_id)
+        stamp_groups(access, user_id)
+        return access
@@ -1,9 +1,10 @@
 from django.urls import path
-from accounts.view_list.auth_views import RegisterView, CustomTokenObtainPairView, CreateInstructorRequestView
+from accounts.view_list.auth_views import RegisterView, CustomTokenObtainPairView, CustomTokenRefreshView, CreateInstructorRequestView
 
 urlpatterns = [
     path("register/", RegisterView.as_view()),
     path("login/", CustomTokenObtainPairView.as_view()),
+    path("token/refresh/", CustomTokenRefreshView.as_view()),
     path("instructor-request/",CreateInstructorRequestView.as_view(),),
 
 ]
@@ -1,10 +1,37 @@
-from .models import GroupPermission
+from django.db.models import F
 
-def get_user_permission_ids(user):
-    perms = GroupPermission.objects.filter(
-        group__in = user.groups.all()
+from .cache import permission_cache
+from .models import GroupPermission, User
+
+
+def load_permission_state(user_id):
+    version = User.objects.filter(pk=user_id).values_list(
+        "permission_version", flat=True
+    ).first() or 0
+    codes = GroupPermission.objects.filter(
+        group__user__id = user_id
     ).values_list("permission__code", flat=True)
-    return list(perms)
+    return version, frozenset(codes)
+
+def get_permission_state(user_id):
+    # (permission_version, frozenset of permission codes)
+    user_id = int(user_id)
+    return permission_cache.get(
+        user_id, lambda: load_permission_state(user_id)
+    )
+
+def get_cached_permissions(user):
+    if user.pk is None:
+        return frozenset()
+    return get_permission_state(user.pk)[1]
+
+def get_user_permission_ids(user):
+    return sorted(get_cached_permissions(user))
 
 def has_permission(user, perm_id):
-    return perm_id in get_user_permission_ids(user)
\ No newline at end of file
+    return perm_id in get_cached_permissions(user)
+
+def bump_permission_version(users):
+    User.objects.filter(pk__in=users).update(
+        permission_version=F("permission_version") + 1
+    )
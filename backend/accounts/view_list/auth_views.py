@@ -9,20 +9,28 @@ from django.shortcuts import get_object_or_404
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
+    query_budget = 7
 
 
-from rest_framework_simplejwt.views import TokenObtainPairView
-from accounts.serializers import CustomTokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from accounts.serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    query_budget = 5
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+    query_budget = 2
 
 
 
 
 class CreateInstructorRequestView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 3
 
     def post(self, request):
         # prevent duplicate pending request
@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed through backend.asgi_urls, where the hot read
+endpoints are async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -9,8 +11,23 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+
+class AsyncRoutesHandler(ASGIHandler):
+    urlconf = 'backend.asgi_urls'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return AsyncRoutesHandler()
+
+
 application = get_asgi_application()
@@ -0,0 +1,12 @@
+"""
+URL configuration of the ASGI application: backend.urls, with the async
+read endpoints of courses.async_urls matched before their sync versions.
+"""
+from django.urls import include, path
+
+from backend.urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/courses/', include('courses.async_urls')),
+    *wsgi_urlpatterns,
+]
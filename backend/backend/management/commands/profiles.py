@@ -0,0 +1,136 @@
+import io
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import profiling
+
+SORT_KEYS = ["cumulative", "tottime", "ncalls"]
+
+
+class Command(BaseCommand):
+    help = "List, aggregate and diff the request profiles kept by backend.profiling"
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest="action", required=True)
+
+        listing = actions.add_parser("list", help="List stored profiles, newest first")
+        self.add_filters(listing)
+        listing.add_argument("--limit", type=int, default=50)
+
+        show = actions.add_parser("show", help="Print one profile and its SQL timeline")
+        show.add_argument("profile_id")
+        self.add_stats_options(show)
+
+        aggregate = actions.add_parser(
+            "aggregate", help="Combine the matching profiles into one report"
+        )
+        aggregate.add_argument("profile_ids", nargs="*", help="Default: every match of the filters")
+        self.add_filters(aggregate)
+        self.add_stats_options(aggregate)
+
+        diff = actions.add_parser(
+            "diff",
+            help=(
+                "Compare the average time per request spent in each function. "
+                "Each side is a profile id, or ids joined by commas."
+            ),
+        )
+        diff.add_argument("before")
+        diff.add_argument("after")
+        diff.add_argument("--limit", type=int, default=25)
+
+    def add_filters(self, parser):
+        parser.add_argument("--view", help="Only profiles of this view class")
+        parser.add_argument("--path", help="Only profiles whose path contains this")
+
+    def add_stats_options(self, parser):
+        parser.add_argument("--sort", choices=SORT_KEYS, default="cumulative")
+        parser.add_argument("--limit", type=int, default=30)
+
+    def handle(self, *args, action, **options):
+        getattr(self, f"handle_{action}")(**options)
+
+    def matching(self, view=None, path=None, **options):
+        return [
+            meta for meta in profiling.list_profiles()
+            if (view is None or meta["view"] == view)
+            and (path is None or path in meta["path"])
+        ]
+
+    def write_stats(self, profile_ids, sort, limit):
+        output = io.StringIO()
+        try:
+            stats = profiling.load_stats(profile_ids, stream=output)
+        except OSError as exc:
+            raise CommandError(f"Cannot read profile: {exc}")
+        stats.sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
+
+    def handle_list(self, limit, **options):
+        profiles = self.matching(**options)[::-1][:limit]
+        self.stdout.write(
+            f"{'id':<30} {'trigger':<7} {'status':>6} {'ms':>9} {'sql ms':>8} {'queries':>7}  request"
+        )
+        for meta in profiles:
+            self.stdout.write(
+                f"{meta['id']:<30} {meta['trigger']:<7} {meta['status']:>6} "
+                f"{meta['duration_ms']:>9.1f} {meta['sql_ms']:>8.1f} {meta['query_count']:>7}  "
+                f"{meta['method']} {meta['path']} ({meta['view']})"
+            )
+
+    def handle_show(self, profile_id, sort, limit, **options):
+        try:
+            meta = profiling.load_profile(profile_id)
+        except OSError:
+            raise CommandError(f"No profile {profile_id}")
+
+        self.stdout.write(
+            f"{meta['method']} {meta['path']} -> {meta['status']} in {meta['duration_ms']:.1f} ms, "
+            f"{meta['query_count']} queries in {meta['sql_ms']:.1f} ms"
+        )
+        self.write_stats([profile_id], sort, limit)
+
+        self.stdout.write("SQL timeline (ms from the start of the request):")
+        for query in meta["queries"]:
+            self.stdout.write(
+                f"{query['at_ms']:>9.2f} +{query['duration_ms']:<7.2f} {query['sql']}"
+            )
+
+    def handle_aggregate(self, profile_ids, sort, limit, **options):
+        if not profile_ids:
+            profile_ids = [meta["id"] for meta in self.matching(**options)]
+        if not profile_ids:
+            raise CommandError("No matching profiles")
+
+        self.stdout.write(f"{len(profile_ids)} profiles")
+        self.write_stats(profile_ids, sort, limit)
+
+    def average_times(self, side):
+        """Total time per function, per request, over the profiles in ``side``."""
+        profile_ids = side.split(",")
+        try:
+            stats = profiling.load_stats(profile_ids, stream=io.StringIO())
+        except OSError as exc:
+            raise CommandError(f"Cannot read profile: {exc}")
+
+        times = defaultdict(float)
+        for function, (_, _, total, _, _) in stats.stats.items():
+            times[function] = total / len(profile_ids)
+        return times
+
+    def handle_diff(self, before, after, limit, **options):
+        before, after = self.average_times(before), self.average_times(after)
+        changes = sorted(
+            ((after[function] - before[function], function) for function in before.keys() | after.keys()),
+            key=lambda change: abs(change[0]),
+            reverse=True,
+        )
+
+        self.stdout.write(f"{'before ms':>10} {'after ms':>10} {'change':>10}  function")
+        for change, function in changes[:limit]:
+            filename, line, name = function
+            self.stdout.write(
+                f"{before[function] * 1000:>10.2f} {after[function] * 1000:>10.2f} "
+                f"{change * 1000:>+10.2f}  {name} ({filename}:{line})"
+            )
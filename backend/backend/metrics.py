@@ -0,0 +1,270 @@
+"""
+Request metrics in the Prometheus text format, plus Server-Timing headers.
+
+``MetricsMiddleware`` records, for every route in backend.urls, request
+counts, a latency histogram, the queries run and the time spent in SQL
+and in the serializers built on ``TimedSerializerMixin``. ``metrics_view``
+exposes them.
+
+Values are kept per process in one dict per thread. Each thread only ever
+writes its own dict, so recording takes no lock; the export adds them up.
+With several worker processes, scrape each one.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.http import HttpResponse
+
+from backend.query_budget import QueryCounter
+
+DEFAULTS = {
+    "ENABLED": True,
+    # upper bounds of the latency histogram, in seconds
+    "BUCKETS": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    # add Server-Timing headers to responses for the ALLOWED_IPS clients
+    "SERVER_TIMING": False,
+    # clients allowed to read the metrics, None for anyone
+    "ALLOWED_IPS": ["127.0.0.1", "::1"],
+    # behind a reverse proxy REMOTE_ADDR is the proxy's; name the META key
+    # of the header it puts the client address in, e.g.
+    # "HTTP_X_FORWARDED_FOR", whose last entry is the one it added
+    "CLIENT_IP_HEADER": None,
+}
+
+METRICS = {
+    "http_requests_total": ("counter", "Requests handled, by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "Time to produce a response"),
+    "db_queries_total": ("counter", "SQL queries run by requests"),
+    "db_query_duration_seconds_total": ("counter", "Time requests spent in SQL"),
+    "serializer_duration_seconds_total": ("counter", "Time requests spent in DRF serializers"),
+}
+
+# routes that didn't resolve share one label instead of one per path
+UNMATCHED = "<unmatched>"
+
+_shards = []
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+# the request being measured in this thread or task
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        # only taken once per thread
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+
+def increment(name, labels, amount=1):
+    shard = _shard()
+    key = (name, labels)
+    shard[key] = shard.get(key, 0) + amount
+
+
+def observe(name, labels, value, buckets):
+    # buckets are stored individually and made cumulative on export
+    index = bisect.bisect_left(buckets, value)
+    increment(f"{name}_bucket", labels + (("le", index),))
+    increment(f"{name}_sum", labels, value)
+    increment(f"{name}_count", labels)
+
+
+def snapshot():
+    totals = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        while True:
+            try:
+                items = list(shard.items())
+                break
+            except RuntimeError:
+                # the owning thread added a key while we were copying
+                continue
+        for key, value in items:
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def reset():
+    with _shards_lock:
+        for shard in _shards:
+            shard.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals=None, buckets=None):
+    """The metrics in the Prometheus text exposition format."""
+    totals = snapshot() if totals is None else totals
+    buckets = get_options()["BUCKETS"] if buckets is None else buckets
+    bounds = [*map(_format_value, buckets), "+Inf"]
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        if kind != "histogram":
+            for (key, labels), value in sorted(totals.items()):
+                if key == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+
+        counts = {}
+        for (key, labels), value in totals.items():
+            if key == f"{name}_bucket":
+                *series, (_, index) = labels
+                counts.setdefault(tuple(series), [0] * len(bounds))[index] += value
+
+        for series, per_bucket in sorted(counts.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, per_bucket):
+                cumulative += count
+                labels = series + (("le", bound),)
+                lines.append(f"{name}_bucket{_format_labels(labels)} {cumulative}")
+            for suffix in ("sum", "count"):
+                value = totals.get((f"{name}_{suffix}", series), 0)
+                lines.append(f"{name}_{suffix}{_format_labels(series)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    __slots__ = ("serializer", "depth")
+
+    def __init__(self):
+        self.serializer = 0.0
+        self.depth = 0
+
+
+class TimedSerializerMixin:
+    """
+    Counts the time a serializer spends turning instances into primitives
+    towards the current request's serializer timing. Nested serializers,
+    and the items of a many=True list, run inside the outer call.
+    """
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or timings.depth:
+            return super().to_representation(instance)
+
+        timings.depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer += time.perf_counter() - started
+            timings.depth -= 1
+
+
+def client_ip(request):
+    header = get_options()["CLIENT_IP_HEADER"]
+    if header and request.META.get(header):
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def is_allowed(request):
+    allowed = get_options()["ALLOWED_IPS"]
+    return allowed is None or client_ip(request) in allowed
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = get_options()
+        if not options["ENABLED"]:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.buckets = options["BUCKETS"]
+        self.server_timing = options["SERVER_TIMING"]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with counter.watch():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.record(request, response, time.perf_counter() - started, counter, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        try:
+            async with counter.awatch():
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.record(request, response, time.perf_counter() - started, counter, timings)
+
+    def record(self, request, response, elapsed, counter, timings):
+        match = getattr(request, "resolver_match", None)
+        labels = (("route", match.route if match else UNMATCHED), ("method", request.method))
+
+        increment("http_requests_total", labels + (("status", response.status_code),))
+        observe("http_request_duration_seconds", labels, elapsed, self.buckets)
+        increment("db_queries_total", labels, counter.count)
+        increment("db_query_duration_seconds_total", labels, counter.duration)
+        increment("serializer_duration_seconds_total", labels, timings.serializer)
+
+        # timings tell clients how the server spends its time; only the
+        # ones allowed to read the metrics get them
+        if self.server_timing and is_allowed(request):
+            response["Server-Timing"] = ", ".join([
+                f"total;dur={elapsed * 1000:.1f}",
+                f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries"',
+                f"serializer;dur={timings.serializer * 1000:.1f}",
+            ])
+        return response
+
+
+def metrics_view(request):
+    if not is_allowed(request):
+        raise PermissionDenied
+
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,267 @@
+"""
+Opt-in request profiling.
+
+``ProfilingMiddleware`` runs a request under cProfile when a staff user
+sends the ``X-Profile`` header, or for a random ``SAMPLE_RATE`` share of
+all requests. Each profile is a pstats dump plus a JSON file with the
+request and a timeline of its SQL queries, kept in a ring of the newest
+``MAX_PROFILES`` under ``DIRECTORY``. ``manage.py profiles`` lists,
+aggregates and diffs them.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from accounts.tokens import token_is_current
+from backend.query_budget import QueryCounter, is_transaction_statement
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    # share of all requests to profile, 0 to only profile on request
+    "SAMPLE_RATE": 0.0,
+    "DIRECTORY": Path(settings.BASE_DIR) / "profiles",
+    "MAX_PROFILES": 200,
+}
+
+HEADER = "HTTP_X_PROFILE"
+
+# cProfile can't run twice at once in a process (3.12+); requests arriving
+# while one is being profiled just aren't
+_profiling = threading.Lock()
+_sequence = 0
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "PROFILING", {})}
+
+
+class QueryTimeline(QueryCounter):
+    """Records when each query started, relative to ``started``, and its SQL."""
+
+    def __init__(self, started):
+        super().__init__()
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        offset = time.perf_counter() - self.started
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - self.started - offset
+            if not is_transaction_statement(sql):
+                self.count += 1
+            self.duration += duration
+            self.queries.append({
+                "at_ms": round(offset * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "sql": sql,
+                "many": many,
+            })
+
+
+def staff_requested(request):
+    if not request.META.get(HEADER):
+        return False
+    # the API authenticates with JWTs, which middleware doesn't see; read
+    # the claim without touching the database
+    try:
+        result = JWTStatelessUserAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return False
+    if result is None or not result[1].get("is_staff"):
+        return False
+    # the claim is as old as the token; revoking staff bumps the user's
+    # permission version, which a cache lookup catches
+    return token_is_current(result[1])
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return None
+    return getattr(match.func, "view_class", match.func).__name__
+
+
+def profile_path(profile_id, suffix):
+    return Path(get_options()["DIRECTORY"]) / f"{profile_id}{suffix}"
+
+
+def save(profiler, meta):
+    global _sequence
+
+    options = get_options()
+    directory = Path(options["DIRECTORY"])
+    directory.mkdir(parents=True, exist_ok=True)
+
+    _sequence += 1
+    profile_id = f"{timezone.now():%Y%m%d-%H%M%S}-{os.getpid()}-{_sequence:06d}"
+    meta["id"] = profile_id
+
+    profiler.dump_stats(profile_path(profile_id, ".prof"))
+    with open(profile_path(profile_id, ".json"), "w") as file:
+        json.dump(meta, file)
+
+    # keep the newest MAX_PROFILES
+    for stale in _stored_ids(directory)[:-options["MAX_PROFILES"] or None]:
+        for suffix in (".prof", ".json"):
+            profile_path(stale, suffix).unlink(missing_ok=True)
+
+    return profile_id
+
+
+def _stored_ids(directory):
+    """Ids of the stored profiles, oldest first, without reading them."""
+    stored = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stored.append((entry.stat().st_mtime_ns, entry.name.removesuffix(".json")))
+            except OSError:
+                # pruned by another process meanwhile
+                continue
+    # ids are zero-padded, so they break mtime ties within a process
+    return [profile_id for _, profile_id in sorted(stored)]
+
+
+def list_profiles():
+    """Metadata of the stored profiles, oldest first."""
+    profiles = []
+    for path in Path(get_options()["DIRECTORY"]).glob("*.json"):
+        try:
+            with open(path) as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            # pruned or still being written by another process
+            continue
+    return sorted(profiles, key=lambda meta: (meta["created_at"], meta["id"]))
+
+
+def load_profile(profile_id):
+    with open(profile_path(profile_id, ".json")) as file:
+        return json.load(file)
+
+
+def load_stats(profile_ids, stream=None):
+    """The pstats of ``profile_ids`` combined into one ``pstats.Stats``."""
+    paths = [str(profile_path(profile_id, ".prof")) for profile_id in profile_ids]
+    return pstats.Stats(*paths, stream=stream)
+
+
+class ProfilingMiddleware:
+    """
+    Under ASGI the profile covers the code running on the event loop,
+    which includes whatever other requests interleave with it. Sync views
+    and the ORM run in worker threads there and only show up in the query
+    timeline; profile those under WSGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = get_options()
+        if not options["ENABLED"]:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.sample_rate = options["SAMPLE_RATE"]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def trigger(self, request):
+        if staff_requested(request):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        trigger = self.trigger(request)
+        if trigger is None or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            timeline = QueryTimeline(started)
+
+            with timeline.watch():
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            return self.store(request, response, trigger, profiler, timeline)
+        finally:
+            _profiling.release()
+
+    async def __acall__(self, request):
+        if request.META.get(HEADER):
+            # checking the token's permission version may query the database
+            trigger = await sync_to_async(self.trigger)(request)
+        else:
+            trigger = self.trigger(request)
+        if trigger is None or not _profiling.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            timeline = QueryTimeline(started)
+
+            async with timeline.awatch():
+                profiler.enable()
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    profiler.disable()
+            return self.store(request, response, trigger, profiler, timeline)
+        finally:
+            _profiling.release()
+
+    def store(self, request, response, trigger, profiler, timeline):
+        elapsed = time.perf_counter() - timeline.started
+
+        meta = {
+            "created_at": timezone.now().isoformat(),
+            "trigger": trigger,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": view_name(request),
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "sql_ms": round(timeline.duration * 1000, 3),
+            "query_count": timeline.count,
+            "queries": timeline.queries,
+        }
+        try:
+            profile_id = save(profiler, meta)
+        except OSError:
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
+        else:
+            if trigger == "header":
+                response["X-Profile-Id"] = profile_id
+        return response
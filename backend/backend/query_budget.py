@@ -0,0 +1,178 @@
+"""
+Per-endpoint SQL query budgets.
+
+Views declare ``query_budget``, either a number or a {method: number}
+mapping. ``QueryBudgetMiddleware`` counts the queries and SQL time of
+every request and logs the ones going over budget; ``QueryBudgetTestMixin``
+turns the same budgets into test assertions.
+"""
+import logging
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+# transaction control differs between backends (SQLite issues BEGIN, MySQL
+# toggles autocommit) and isn't held against a budget
+TRANSACTION_STATEMENTS = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE SAVEPOINT")
+
+
+def is_transaction_statement(sql):
+    return sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS)
+
+
+class QueryCounter:
+    """``execute_wrapper`` hook counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not is_transaction_statement(sql):
+                self.count += 1
+            self.duration += time.perf_counter() - started
+
+    def watch(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @asynccontextmanager
+    async def awatch(self):
+        # async code queries through sync_to_async, on the thread a request's
+        # sync calls share; hook that thread's connections, not the loop's
+        stack = await sync_to_async(self.watch)()
+        try:
+            yield self
+        finally:
+            await sync_to_async(stack.close)()
+
+
+def get_budget(view_func, method):
+    view_class = getattr(view_func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+
+    if isinstance(budget, dict):
+        return budget.get(method.upper())
+    return budget
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        with counter.watch():
+            response = self.get_response(request)
+
+        self.check(request, counter, started)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+
+        async with counter.awatch():
+            response = await self.get_response(request)
+
+        self.check(request, counter, started)
+        return response
+
+    def check(self, request, counter, started):
+        match = getattr(request, "resolver_match", None)
+        budget = get_budget(match.func, request.method) if match else None
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s ran %d queries, over its budget of %d (%.1f ms, %.1f ms in SQL)",
+                request.method,
+                request.path,
+                counter.count,
+                budget,
+                (time.perf_counter() - started) * 1000,
+                counter.duration * 1000,
+            )
+
+
+class QueryBudgetTestMixin:
+    """
+    For test cases: ``assertWithinBudget`` performs a request with
+    ``self.client`` and fails when the view has no budget for the method
+    or runs more queries than it allows. ``assertAsyncWithinBudget`` does
+    the same with ``self.async_client``, for async views.
+    """
+
+    def assertWithinBudget(self, method, path, **kwargs):
+        with self._budget(method, path):
+            return getattr(self.client, method)(path, **kwargs)
+
+    def assertAsyncWithinBudget(self, method, path, **kwargs):
+        # the view's sync_to_async calls come back to this thread, and so
+        # to the connections captured here
+        with self._budget(method, path):
+            return async_to_sync(getattr(self.async_client, method))(path, **kwargs)
+
+    @contextmanager
+    def _budget(self, method, path):
+        match = resolve(urlsplit(path).path)
+        budget = get_budget(match.func, method)
+        self.assertIsNotNone(
+            budget, f"{match.func.__name__} declares no query_budget for {method.upper()}"
+        )
+
+        # set aside callbacks from fixtures, which would never run and
+        # would make on_commit_once() skip the request's own
+        default = connections[DEFAULT_DB_ALIAS]
+        fixture_callbacks, default.run_on_commit = default.run_on_commit, []
+        with ExitStack() as stack:
+            stack.callback(setattr, default, "run_on_commit", fixture_callbacks)
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connection))
+                for connection in connections.all()
+            ]
+            # outside tests, on_commit work runs within the request too
+            stack.enter_context(self.captureOnCommitCallbacks(execute=True))
+            yield
+
+        queries = [
+            query["sql"]
+            for context in captured
+            for query in context.captured_queries
+            if not is_transaction_statement(query["sql"])
+        ]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{method.upper()} {path} ran {len(queries)} queries, over its "
+            f"budget of {budget}:\n" + "\n".join(queries),
+        )
+
+    def assertAllViewsBudgeted(self, urlpatterns):
+        missing = [
+            str(pattern.pattern)
+            for pattern in urlpatterns
+            if getattr(getattr(pattern.callback, "view_class", None), "query_budget", None) is None
+        ]
+        self.assertEqual(missing, [], "Endpoints without a query_budget")
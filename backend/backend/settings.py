@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 
     'accounts',
     'courses',
+    # only for its management commands (manage.py profiles)
+    'backend',
     
     'rest_framework',
     'corsheaders',
@@ -48,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.profiling.ProfilingMiddleware',
+    'backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +62,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if DEBUG:
+    # logs endpoints going over their query_budget, see backend.query_budget
+    MIDDLEWARE.insert(0, 'backend.query_budget.QueryBudgetMiddleware')
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -150,8 +158,24 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'courses.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Upper bound for the ?page_size= query parameter on list endpoints
+PAGINATION_MAX_PAGE_SIZE = 100
+
+# Course catalog search. Defaults to MySQL FULLTEXT, or an in-process
+# inverted index on other databases; set a dotted path to override.
+# The inverted index reloads when a generation in COURSE_SEARCH_CACHE
+# changes, so processes sharing that cache see each other's changes.
+COURSE_SEARCH_BACKEND = None
+COURSE_SEARCH_CACHE = 'default'
+COURSE_SEARCH_MAX_RESULTS = 500
+
+# Largest course tree accepted by the bulk import endpoint
+COURSE_IMPORT_MAX_CHAPTERS = 2000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -159,6 +183,65 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     
     'AUTH_HEADER_TYPES': ('Bearer',),
+
+    # used by views that opt into JWTStatelessUserAuthentication
+    'TOKEN_USER_CLASS': 'accounts.authentication.LazyTokenUser',
+}
+
+# Use a shared backend (Redis, Memcached) in production so that response
+# cache versions are seen by every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Published course detail and catalog pages, see courses.response_cache
+RESPONSE_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 600,
+}
+
+# Resolved permission codes per user, see accounts.cache.
+# Set SHARED_CACHE to a CACHES alias when running several processes, so an
+# invalidation in one reaches the others; entries are then only kept there.
+PERMISSION_CACHE = {
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 10000,
+    'SHARED_CACHE': None,
+}
+
+# Learner heartbeats are buffered per process and written in batches,
+# see courses.progress.
+PROGRESS_BUFFER = {
+    'MAX_PENDING': 500,
+    'FLUSH_INTERVAL': 10,
+}
+
+# Resized course thumbnails, see courses.thumbnails.
+THUMBNAILS = {
+    'WIDTHS': [160, 320, 640, 960],
+    'FORMATS': ['webp', 'jpeg'],
+    'BACKGROUND': True,
+}
+
+# Request profiles, see backend.profiling. Staff send "X-Profile: 1" to
+# profile a request; SAMPLE_RATE profiles a share of all requests.
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.0,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_PROFILES': 200,
+}
+
+# Per-process request metrics served at /metrics, see backend.metrics
+# Behind a reverse proxy set CLIENT_IP_HEADER (e.g. 'HTTP_X_FORWARDED_FOR'),
+# or every client shares the proxy's REMOTE_ADDR.
+METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': DEBUG,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'CLIENT_IP_HEADER': None,
 }
 
 # CORS Settings
@@ -0,0 +1,14 @@
+"""
+The project settings on a local SQLite file instead of MySQL, e.g. to
+compare the two in benchmarks:
+
+    python manage.py benchmark_endpoints --settings=backend.settings_sqlite
+"""
+from backend.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+}
@@ -0,0 +1,119 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from accounts.cache import permission_cache
+from accounts.models import User
+from accounts.tokens import PermissionRefreshToken
+from backend import metrics, profiling
+from courses.models import Course
+
+
+class ProfilingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email="staff@example.com", user_name="staff", password="pw", is_staff=True
+        )
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw"
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+        permission_cache.invalidate_all()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROFILING={"DIRECTORY": directory.name}))
+
+    def profile(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.client.get("/api/courses/", headers={"X-Profile": "1"})
+
+    def test_staff_header(self):
+        response = self.profile(PermissionRefreshToken.for_user(self.staff).access_token)
+        self.assertIn("X-Profile-Id", response)
+
+    @override_settings(ROOT_URLCONF="backend.asgi_urls")
+    def test_staff_header_async(self):
+        token = PermissionRefreshToken.for_user(self.staff).access_token
+        # checking the token's permission version has to query the database
+        permission_cache.invalidate_all()
+        response = async_to_sync(self.async_client.get)(
+            "/api/courses/", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Profile-Id", response)
+
+    def test_ring_pruned_without_reading_profiles(self):
+        token = PermissionRefreshToken.for_user(self.staff).access_token
+        directory = profiling.get_options()["DIRECTORY"]
+        with override_settings(PROFILING={"DIRECTORY": directory, "MAX_PROFILES": 2}):
+            ids = [self.profile(token)["X-Profile-Id"] for _ in range(2)]
+            with mock.patch("backend.profiling.json.load") as load:
+                ids.append(self.profile(token)["X-Profile-Id"])
+        load.assert_not_called()
+
+        self.assertEqual(sorted(path.stem for path in Path(directory).glob("*.json")), sorted(ids[1:]))
+
+    def test_header_ignored_for_students(self):
+        response = self.profile(PermissionRefreshToken.for_user(self.student).access_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_header_ignored_once_staff_is_revoked(self):
+        token = PermissionRefreshToken.for_user(self.staff).access_token
+        staff = User.objects.get(pk=self.staff.pk)
+        staff.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            staff.save()
+
+        response = self.profile(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_allowed_addresses_only(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 403)
+
+    @override_settings(METRICS={"CLIENT_IP_HEADER": "HTTP_X_FORWARDED_FOR"})
+    def test_client_address_from_proxy_header(self):
+        # the proxy runs on this host and appends the address it saw
+        forwarded = {"X-Forwarded-For": "127.0.0.1, 203.0.113.7"}
+        self.assertEqual(self.client.get("/metrics", headers=forwarded).status_code, 403)
+        forwarded = {"X-Forwarded-For": "203.0.113.7, 127.0.0.1"}
+        self.assertEqual(self.client.get("/metrics", headers=forwarded).status_code, 200)
+
+    @override_settings(METRICS={"SERVER_TIMING": True})
+    def test_server_timing_for_allowed_addresses_only(self):
+        self.assertIn("Server-Timing", self.client.get("/api/courses/"))
+        caches["default"].clear()
+        self.assertNotIn("Server-Timing", self.client.get("/api/courses/", REMOTE_ADDR="203.0.113.7"))
+
+    def test_server_timing_off_by_default(self):
+        with override_settings(METRICS={}):
+            self.assertNotIn("Server-Timing", self.client.get("/api/courses/"))
+
+    def test_serializer_time(self):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        Course.objects.create(creator=instructor, title="Course", description="", is_published=True)
+        metrics.reset()
+
+        self.client.get("/api/courses/")
+
+        totals = metrics.snapshot()
+        labels = (("route", "api/courses/"), ("method", "GET"))
+        self.assertGreater(totals[("serializer_duration_seconds_total", labels)], 0)
@@ -0,0 +1,25 @@
+from django.db.models import Q
+
+from courses.models import Course
+
+
+def has_video_access(user, course_id):
+    # creators and enrolled students may watch; decided once per request
+    # and handed to ChapterSerializer through the "video_access" context
+    if user is None or not user.is_authenticated:
+        return False
+
+    return video_access_queryset(user, course_id).exists()
+
+
+async def ahas_video_access(user, course_id):
+    if user is None or not user.is_authenticated:
+        return False
+
+    return await video_access_queryset(user, course_id).aexists()
+
+
+def video_access_queryset(user, course_id):
+    return Course.objects.filter(pk=course_id).filter(
+        Q(creator_id=user.id) | Q(enrollments__user_id=user.id)
+    )
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from courses.models import EnrollmentRollup
+
+INTERVALS = ("day", "week")
+MAX_DAYS = 366
+
+
+def parse_range(params):
+    """
+    Read ?from=, ?to= (ISO dates, inclusive) and ?interval= from query
+    params. Defaults to the last 365 days by day. Raises ValueError with a
+    message meant for the client.
+    """
+    interval = params.get("interval", "day")
+    if interval not in INTERVALS:
+        raise ValueError("interval must be one of: " + ", ".join(INTERVALS))
+
+    try:
+        end = date.fromisoformat(params["to"]) if params.get("to") else timezone.localdate()
+        start = date.fromisoformat(params["from"]) if params.get("from") else end - timedelta(days=364)
+    except ValueError:
+        raise ValueError("from and to must be dates as YYYY-MM-DD")
+
+    if start > end:
+        raise ValueError("from must not be after to")
+    if (end - start).days >= MAX_DAYS:
+        raise ValueError(f"A range can span at most {MAX_DAYS} days")
+
+    return start, end, interval
+
+
+def _bucket(day, interval):
+    # weeks start on Monday
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def enrollment_series(course_ids, start, end, interval="day"):
+    """
+    Enrollments per day or week for each course between ``start`` and
+    ``end``, read from the daily rollups: at most one row per course and
+    day. Returns {course_id: [{"date", "enrollments"}, ...]} with empty
+    buckets filled in.
+    """
+    counts = defaultdict(lambda: defaultdict(int))
+    rows = EnrollmentRollup.objects.filter(
+        course_id__in=course_ids, day__range=(start, end)
+    ).values_list("course_id", "day", "enrollments")
+
+    for course_id, day, enrollments in rows:
+        counts[course_id][_bucket(day, interval)] += enrollments
+
+    buckets = []
+    bucket = _bucket(start, interval)
+    step = timedelta(weeks=1) if interval == "week" else timedelta(days=1)
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket += step
+
+    return {
+        course_id: [
+            {"date": bucket.isoformat(), "enrollments": counts[course_id][bucket]}
+            for bucket in buckets
+        ]
+        for course_id in course_ids
+    }
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from courses.view_list.async_views import (
+    AsyncCourseDetailView,
+    AsyncCourseListView,
+    AsyncLearnCourseView,
+    AsyncMyEnrollmentsView,
+)
+
+# served ahead of courses.urls by the ASGI application, see backend.asgi_urls
+urlpatterns = [
+    path("", AsyncCourseListView.as_view()),
+    path("my-enrollments/", AsyncMyEnrollmentsView.as_view()),
+    path("<int:pk>/", AsyncCourseDetailView.as_view()),
+    path("learn/<int:pk>/", AsyncLearnCourseView.as_view()),
+]
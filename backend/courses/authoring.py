@@ -0,0 +1,60 @@
+from django.db import transaction
+
+from courses.models import Chapter, Course, Section
+from courses.ordering import GAP
+
+
+def create_course_tree(creator, data):
+    """
+    Create a course with all of its sections and chapters from validated
+    nested data: one insert for the course and one bulk insert per level,
+    with orders and duration counters computed here instead of per save.
+    """
+    sections = data.pop("sections", [])
+
+    for section in sections:
+        chapters = section.get("chapters", [])
+        section["total_hours"] = sum(ch["video_duration"] for ch in chapters)
+        section["chapter_count"] = len(chapters)
+
+    with transaction.atomic():
+        course = Course.objects.create(
+            creator=creator,
+            total_hours=sum(section["total_hours"] for section in sections),
+            chapter_count=sum(section["chapter_count"] for section in sections),
+            **data,
+        )
+
+        Section.objects.bulk_create(
+            Section(
+                course=course,
+                title=section["title"],
+                sort_key=index * GAP,
+                total_hours=section["total_hours"],
+                chapter_count=section["chapter_count"],
+            )
+            for index, section in enumerate(sections, start=1)
+        )
+
+        # MySQL does not hand back primary keys from bulk inserts, so map
+        # the new sections through their unique sort keys instead
+        section_ids = dict(
+            Section.objects.filter(course=course).values_list("sort_key", "pk")
+        )
+
+        Chapter.objects.bulk_create(
+            (
+                Chapter(
+                    section_id=section_ids[index * GAP],
+                    title=chapter["title"],
+                    video_url=chapter["video_url"],
+                    video_duration=chapter["video_duration"],
+                    sort_key=position * GAP,
+                )
+                for index, section in enumerate(sections, start=1)
+                for position, chapter in enumerate(section.get("chapters", []), start=1)
+            ),
+            batch_size=500,
+        )
+
+    return course
@@ -0,0 +1,555 @@
+"""
+Synthetic LMS data and an endpoint benchmark over it.
+
+``seed`` fills the database with instructors, courses, sections, chapters,
+students and enrollments using bulk inserts. ``run`` requests every API
+endpoint through the full middleware stack and reports p50/p95 latency and
+queries per request, keyed by route so that results from different commits
+(or databases) line up.
+"""
+import io
+import random
+import subprocess
+import time
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.urls import URLResolver, get_resolver, resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.tokens import PermissionRefreshToken
+from backend.query_budget import QueryCounter
+from courses import counters
+from courses.models import Chapter, Course, Enrollment, Section
+from courses.ordering import GAP
+from courses.search import get_search_backend, rebuild_documents
+
+BATCH_SIZE = 1000
+PASSWORD = "benchmark-password"
+
+DATASET = {
+    "instructors": 20,
+    "courses": 200,
+    "sections": 5,
+    "chapters": 8,
+    "students": 2000,
+    "enrollments": 5,
+}
+
+LEVELS = ["Introduction to", "Practical", "Advanced", "Modern"]
+TOPICS = [
+    "Python", "Django", "SQL", "React", "Statistics",
+    "Design", "Marketing", "Rust", "Networking", "Algebra",
+]
+
+
+def add_dataset_arguments(parser):
+    for name, default in DATASET.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+
+def _insert(model, objects):
+    objects = iter(objects)
+    while batch := list(islice(objects, BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+
+
+def _create_users(prefix, role, count, password):
+    label = role.lower()
+    _insert(User, (
+        User(email=f"{prefix}-{label}{i}@example.com", user_name=f"{label}{i}", password=password)
+        for i in range(count)
+    ))
+    # bulk_create doesn't return primary keys on MySQL
+    ids = list(
+        User.objects.filter(email__startswith=f"{prefix}-{label}")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    group = Group.objects.get(name=role)
+    Membership = User.groups.through
+    _insert(Membership, (Membership(user_id=pk, group_id=group.pk) for pk in ids))
+    return ids
+
+
+def seed(instructors, courses, sections, chapters, students, enrollments, seed=0, prefix="bench"):
+    """
+    Insert a synthetic dataset and bring the stored counters, rollups and
+    search documents up to date. ``courses`` are spread over the
+    instructors; ``sections`` and ``chapters`` are per course and per
+    section, ``enrollments`` per student. Returns the ids created.
+    """
+    rng = random.Random(seed)
+    # hashing is deliberately slow; every user shares one hash
+    password = make_password(PASSWORD)
+
+    call_command("setup_roles", verbosity=0, stdout=io.StringIO())
+
+    with transaction.atomic():
+        instructor_ids = _create_users(prefix, "Instructor", instructors, password)
+        student_ids = _create_users(prefix, "Student", students, password)
+
+        _insert(Course, (
+            Course(
+                creator_id=instructor_ids[i % len(instructor_ids)],
+                title=f"{rng.choice(LEVELS)} {rng.choice(TOPICS)} {i}",
+                description=f"{prefix} course {i}",
+                is_published=i == 0 or rng.random() < 0.9,
+            )
+            for i in range(courses)
+        ))
+        course_ids = list(
+            Course.objects.filter(creator_id__in=instructor_ids)
+            .order_by("pk")
+            .values_list("pk", "is_published")
+        )
+
+        _insert(Section, (
+            Section(course_id=course_id, title=f"Part {s + 1}", sort_key=(s + 1) * GAP)
+            for course_id, _ in course_ids
+            for s in range(sections)
+        ))
+        section_ids = list(
+            Section.objects.filter(course_id__in=[course_id for course_id, _ in course_ids])
+            .values_list("pk", flat=True)
+        )
+
+        _insert(Chapter, (
+            Chapter(
+                section_id=section_id,
+                title=f"Lesson {c + 1}",
+                video_url=f"https://videos.example.com/{section_id}/{c + 1}.mp4",
+                video_duration=round(rng.uniform(0.05, 0.5), 2),
+                sort_key=(c + 1) * GAP,
+            )
+            for section_id in section_ids
+            for c in range(chapters)
+        ))
+
+        published = [course_id for course_id, is_published in course_ids if is_published]
+        _insert(Enrollment, (
+            Enrollment(user_id=user_id, course_id=course_id)
+            for user_id in student_ids
+            for course_id in rng.sample(published, min(enrollments, len(published)))
+        ))
+
+        seeded = Course.objects.filter(creator_id__in=instructor_ids)
+        counters.rebuild_counters(seeded)
+        counters.rebuild_enrollment_counts(seeded)
+        counters.rebuild_instructor_stats(instructor_ids)
+        counters.rebuild_enrollment_rollups(seeded)
+        rebuild_documents()
+
+    get_search_backend().reset()
+
+    return {
+        "instructors": instructor_ids,
+        "students": student_ids,
+        "courses": [course_id for course_id, _ in course_ids],
+        "published": published,
+    }
+
+
+class Fixture:
+    """The users and courses the benchmark requests are made as and against."""
+
+    def __init__(self, ids):
+        self.course = (
+            Course.objects.filter(pk__in=ids["published"])
+            .order_by("-enrollment_count", "pk")
+            .first()
+        )
+        self.instructor = self.course.creator
+        self.student = User.objects.filter(enrollments__course=self.course).order_by("pk").first()
+        self.chapter = Chapter.objects.filter(section__course=self.course).first()
+        self.student_ids = ids["students"]
+        self.admin = User.objects.create_user(
+            email="benchmark-admin@example.com", user_name="admin", password=PASSWORD, is_staff=True
+        )
+
+        # writes go to a course of its own so reads keep seeing the same data
+        self.spare = Course.objects.create(
+            creator=self.instructor, title="Benchmark scratch course", description="", is_published=True
+        )
+        self.spare_section = Section.objects.create(course=self.spare, title="Scratch")
+        for i in range(5):
+            Chapter.objects.create(
+                section=self.spare_section,
+                title=f"Scratch {i}",
+                video_url="https://videos.example.com/scratch.mp4",
+                video_duration=0.25,
+            )
+
+        image = io.BytesIO()
+        Image.new("RGB", (1280, 720), "steelblue").save(image, "JPEG")
+        self.course.thumbnail.save("benchmark.jpg", ContentFile(image.getvalue()))
+
+        self._tokens = {}
+
+    def nth_student(self, i):
+        return User.objects.get(pk=self.student_ids[i % len(self.student_ids)])
+
+    def token(self, user):
+        if user.pk not in self._tokens:
+            self._tokens[user.pk] = str(PermissionRefreshToken.for_user(user).access_token)
+        return self._tokens[user.pk]
+
+    def authenticate(self, client, user):
+        if user is None:
+            client.credentials()
+            return
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(user)}")
+
+    def scratch_section(self):
+        section = Section.objects.create(course=self.spare, title="Disposable")
+        for i in range(3):
+            Chapter.objects.create(
+                section=section,
+                title=f"Disposable {i}",
+                video_url="https://videos.example.com/scratch.mp4",
+                video_duration=0.25,
+            )
+        return section
+
+
+# Every scenario takes the fixture and the iteration number and returns
+# (method, path, user, request kwargs); anything it sets up beforehand is
+# not timed.
+SCENARIOS = []
+
+
+def scenario(build):
+    SCENARIOS.append(build)
+    return build
+
+
+@scenario
+def catalog(f, i):
+    return "get", "/api/courses/", None, {}
+
+
+@scenario
+def my_enrollments(f, i):
+    return "get", "/api/courses/my-enrollments/", f.student, {}
+
+
+@scenario
+def my_courses(f, i):
+    return "get", "/api/courses/my-courses/", f.instructor, {}
+
+
+@scenario
+def create_course(f, i):
+    data = {"title": f"Created {i}", "description": "Benchmark"}
+    return "post", "/api/courses/create/", f.instructor, {"data": data}
+
+
+@scenario
+def import_course(f, i):
+    data = {
+        "title": f"Imported {i}",
+        "description": "Benchmark",
+        "sections": [
+            {
+                "title": f"Part {s}",
+                "chapters": [
+                    {"title": f"Lesson {c}", "video_url": "https://videos.example.com/v.mp4", "video_duration": 0.2}
+                    for c in range(20)
+                ],
+            }
+            for s in range(5)
+        ],
+    }
+    return "post", "/api/courses/import/", f.instructor, {"data": data, "format": "json"}
+
+
+@scenario
+def update_course(f, i):
+    data = {"title": f"Benchmark scratch course {i}"}
+    return "patch", f"/api/courses/{f.spare.pk}/update/", f.instructor, {"data": data, "format": "multipart"}
+
+
+@scenario
+def course_detail(f, i):
+    return "get", f"/api/courses/{f.course.pk}/", f.student, {}
+
+
+@scenario
+def learn(f, i):
+    return "get", f"/api/courses/learn/{f.course.pk}/", f.student, {}
+
+
+@scenario
+def heartbeat(f, i):
+    data = {"chapter": f.chapter.pk, "position": i * 10}
+    return "post", f"/api/courses/learn/{f.course.pk}/progress/", f.student, {"data": data, "format": "json"}
+
+
+@scenario
+def progress(f, i):
+    return "get", f"/api/courses/learn/{f.course.pk}/progress/", f.student, {}
+
+
+@scenario
+def resume(f, i):
+    return "get", f"/api/courses/learn/{f.course.pk}/resume/", f.student, {}
+
+
+@scenario
+def create_section(f, i):
+    data = {"course": f.spare.pk, "title": f"Section {i}"}
+    return "post", "/api/courses/section/create/", f.instructor, {"data": data}
+
+
+@scenario
+def update_section(f, i):
+    data = {"title": f"Scratch {i}"}
+    return "patch", f"/api/courses/section/{f.spare_section.pk}/update/", f.instructor, {"data": data}
+
+
+@scenario
+def reorder_sections(f, i):
+    ids = list(f.spare.sections.values_list("pk", flat=True))
+    ids = ids[1:] + ids[:1]
+    data = {"course_id": f.spare.pk, "sections": [{"id": pk, "order": n} for n, pk in enumerate(ids, start=1)]}
+    return "patch", "/api/courses/section/reorder/", f.instructor, {"data": data, "format": "json"}
+
+
+@scenario
+def delete_section(f, i):
+    return "delete", f"/api/courses/section/{f.scratch_section().pk}/delete/", f.instructor, {}
+
+
+@scenario
+def create_chapter(f, i):
+    data = {
+        "section": f.spare_section.pk,
+        "title": f"Chapter {i}",
+        "video_url": "https://videos.example.com/new.mp4",
+        "video_duration": 0.3,
+    }
+    return "post", "/api/courses/chapter/create/", f.instructor, {"data": data}
+
+
+@scenario
+def update_chapter(f, i):
+    chapter = f.spare_section.chapters.first()
+    data = {"video_duration": 0.1 + i / 100}
+    return "patch", f"/api/courses/chapter/{chapter.pk}/update/", f.instructor, {"data": data}
+
+
+@scenario
+def reorder_chapters(f, i):
+    ids = list(f.spare_section.chapters.values_list("pk", flat=True))
+    ids = ids[1:] + ids[:1]
+    data = {
+        "section_id": f.spare_section.pk,
+        "chapters": [{"id": pk, "order": n} for n, pk in enumerate(ids, start=1)],
+    }
+    return "patch", "/api/courses/chapter/reorder/", f.instructor, {"data": data, "format": "json"}
+
+
+@scenario
+def delete_chapter(f, i):
+    chapter = Chapter.objects.create(
+        section=f.spare_section,
+        title="Disposable",
+        video_url="https://videos.example.com/scratch.mp4",
+        video_duration=0.25,
+    )
+    return "delete", f"/api/courses/chapter/{chapter.pk}/delete/", f.instructor, {}
+
+
+@scenario
+def enroll(f, i):
+    return "post", f"/api/courses/{f.spare.pk}/enroll/", f.nth_student(i), {}
+
+
+@scenario
+def bulk_enroll(f, i):
+    emails = User.objects.filter(pk__in=f.student_ids[:100]).values_list("email", flat=True)
+    upload = SimpleUploadedFile("cohort.csv", "\n".join(["email", *emails]).encode())
+    return "post", f"/api/courses/{f.spare.pk}/bulk-enroll/", f.admin, {"data": {"file": upload}, "format": "multipart"}
+
+
+@scenario
+def toggle_publish(f, i):
+    return "patch", f"/api/courses/{f.spare.pk}/toggle-publish/", f.instructor, {}
+
+
+@scenario
+def thumbnail(f, i):
+    return "get", f"/api/courses/{f.course.pk}/thumbnail/320.jpg", None, {}
+
+
+@scenario
+def dashboard(f, i):
+    return "get", "/api/courses/instructor/dashboard/", f.instructor, {}
+
+
+@scenario
+def analytics(f, i):
+    return "get", "/api/courses/instructor/analytics/", f.instructor, {}
+
+
+@scenario
+def instructor_course(f, i):
+    return "get", f"/api/courses/instructor/course/{f.course.pk}/", f.instructor, {}
+
+
+@scenario
+def register(f, i):
+    data = {"email": f"registered{i}@example.com", "user_name": f"registered{i}", "password": PASSWORD}
+    return "post", "/api/accounts/register/", None, {"data": data}
+
+
+@scenario
+def login(f, i):
+    data = {"email": f.student.email, "password": PASSWORD}
+    return "post", "/api/accounts/login/", None, {"data": data}
+
+
+@scenario
+def refresh(f, i):
+    data = {"refresh": str(PermissionRefreshToken.for_user(f.student))}
+    return "post", "/api/accounts/token/refresh/", None, {"data": data}
+
+
+@scenario
+def instructor_request(f, i):
+    data = {"message": "I would like to teach"}
+    return "post", "/api/accounts/instructor-request/", f.nth_student(i), {"data": data}
+
+
+def api_routes(resolver=None, prefix=""):
+    """Yield the route of every endpoint under api/."""
+    for pattern in (resolver or get_resolver()).url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern, route)
+        elif route.startswith("api/"):
+            yield route
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = (len(values) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (index - lower)
+
+
+def measure(client, fixture, build, iterations, warmup, cold):
+    timings, queries, sql_time = [], [], []
+    statuses = Counter()
+
+    for i in range(warmup + iterations):
+        method, path, user, kwargs = build(fixture, i)
+        fixture.authenticate(client, user)
+        if cold:
+            for cache in caches.all():
+                cache.clear()
+
+        counter = QueryCounter()
+        with counter.watch():
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - started
+
+        if i < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(counter.count)
+        sql_time.append(counter.duration * 1000)
+        statuses[response.status_code] += 1
+
+    match = resolve(path)
+    return {
+        "method": method.upper(),
+        "route": match.route,
+        "view": getattr(match.func, "view_class", match.func).__name__,
+        "requests": iterations,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "mean_ms": round(sum(timings) / iterations, 3),
+        "max_ms": round(max(timings), 3),
+        "queries": max(queries),
+        "queries_mean": round(sum(queries) / iterations, 2),
+        "sql_ms_mean": round(sum(sql_time) / iterations, 3),
+    }
+
+
+def run(ids, iterations=20, warmup=2, cold=False):
+    """
+    Request every scenario ``iterations`` times after ``warmup`` untimed
+    requests. Returns the results keyed by "METHOD route", along with the
+    API routes no scenario covers.
+    """
+    fixture = Fixture(ids)
+    client = APIClient()
+
+    endpoints = {}
+    for build in SCENARIOS:
+        result = measure(client, fixture, build, iterations, warmup, cold)
+        endpoints[f"{result['method']} {result['route']}"] = result
+
+    covered = {result["route"] for result in endpoints.values()}
+    return endpoints, sorted(set(api_routes()) - covered)
+
+
+def database_info():
+    if connection.vendor == "mysql":
+        version = ".".join(map(str, connection.mysql_version))
+    elif connection.vendor == "sqlite":
+        version = connection.Database.sqlite_version
+    else:
+        version = None
+    return {"vendor": connection.vendor, "version": version}
+
+
+def current_commit():
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def report(dataset, endpoints, missing, **options):
+    return {
+        "commit": current_commit(),
+        "created_at": timezone.now().isoformat(),
+        "database": database_info(),
+        "dataset": dataset,
+        "options": options,
+        "endpoints": endpoints,
+        "missing": missing,
+    }
+
+
+def compare(baseline, current):
+    """Yield (endpoint, baseline, current) for the endpoints in both results."""
+    for key, result in current["endpoints"].items():
+        if key in baseline["endpoints"]:
+            yield key, baseline["endpoints"][key], result
@@ -0,0 +1,265 @@
+from django.apps import apps as global_apps
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+
+def apply_chapter_delta(section_id, hours=0.0, chapters=0, apps=global_apps):
+    Section = apps.get_model("courses", "Section")
+    Course = apps.get_model("courses", "Course")
+
+    Section.objects.filter(pk=section_id).update(
+        total_hours=F("total_hours") + hours,
+        chapter_count=F("chapter_count") + chapters,
+    )
+    Course.objects.filter(sections__pk=section_id).update(
+        total_hours=F("total_hours") + hours,
+        chapter_count=F("chapter_count") + chapters,
+    )
+
+
+def chapter_saved(chapter, previous):
+    # previous is the (section_id, video_duration) pair loaded from the db,
+    # or None for a freshly created chapter
+    if previous is None:
+        apply_chapter_delta(chapter.section_id, chapter.video_duration, 1)
+        return
+
+    old_section_id, old_duration = previous
+
+    if old_section_id != chapter.section_id:
+        apply_chapter_delta(old_section_id, -old_duration, -1)
+        apply_chapter_delta(chapter.section_id, chapter.video_duration, 1)
+    elif old_duration != chapter.video_duration:
+        apply_chapter_delta(
+            chapter.section_id, chapter.video_duration - old_duration
+        )
+
+
+def chapter_deleted(chapter):
+    apply_chapter_delta(chapter.section_id, -chapter.video_duration, -1)
+
+
+def section_totals(section, apps=global_apps):
+    # read from the chapter rows about to be cascaded, not from the
+    # section instance, whose counters may be stale
+    Chapter = apps.get_model("courses", "Chapter")
+
+    return Chapter.objects.filter(section_id=section.pk).aggregate(
+        hours=Coalesce(Sum("video_duration"), Value(0.0)),
+        chapters=Count("pk"),
+    )
+
+
+def section_deleted(section, totals, apps=global_apps):
+    # totals is what section_totals returned before the delete
+    Course = apps.get_model("courses", "Course")
+
+    Course.objects.filter(pk=section.course_id).update(
+        total_hours=F("total_hours") - totals["hours"],
+        chapter_count=F("chapter_count") - totals["chapters"],
+    )
+
+
+def apply_enrollment_delta(course_id, enrollments, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+
+    Course.objects.filter(pk=course_id).update(
+        enrollment_count=F("enrollment_count") + enrollments
+    )
+
+
+def lock_instructor_stats(course_id, apps=global_apps):
+    """
+    Lock the stats row of ``course_id``'s instructor until the end of the
+    transaction. Taken before an enrollment is written, concurrent
+    enrollments with the same instructor are written one after the other,
+    and apply_student_delta never waits on another's uncommitted row.
+    """
+    Course = apps.get_model("courses", "Course")
+    InstructorStats = apps.get_model("courses", "InstructorStats")
+
+    creator = Course.objects.filter(pk=course_id).values("creator_id")
+    list(
+        InstructorStats.objects.select_for_update()
+        .filter(instructor_id=Subquery(creator))
+        .values_list("pk", flat=True)
+    )
+
+
+def apply_student_delta(course_id, user_id, enrollments, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    Enrollment = apps.get_model("courses", "Enrollment")
+    InstructorStats = apps.get_model("courses", "InstructorStats")
+
+    creator = Course.objects.filter(pk=course_id).values("creator_id")
+
+    # a student counts once per instructor, however many of their courses
+    # they take: only the first enrollment in and the last one out matter.
+    # The count runs inside the UPDATE, under the stats row lock, so two
+    # enrollments with the same instructor cannot both act on one count.
+    remaining = (
+        Enrollment.objects.filter(
+            user_id=user_id, course__creator_id=OuterRef("instructor_id")
+        )
+        .order_by()
+        .values("user_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    boundary = When(
+        Exact(Coalesce(Subquery(remaining), Value(0)), 1 if enrollments > 0 else 0),
+        then=Value(enrollments),
+    )
+
+    InstructorStats.objects.filter(instructor_id=Subquery(creator)).update(
+        total_enrollments=F("total_enrollments") + enrollments,
+        total_students=F("total_students") + Case(boundary, default=Value(0)),
+    )
+
+
+def apply_rollup_delta(course_id, day, enrollments, apps=global_apps):
+    EnrollmentRollup = apps.get_model("courses", "EnrollmentRollup")
+
+    # make sure the day's row exists, then bump it without a read; a row
+    # missing on the way down went away with its course, there is nothing
+    # left to take from
+    if enrollments > 0:
+        EnrollmentRollup.objects.bulk_create(
+            [EnrollmentRollup(course_id=course_id, day=day)],
+            ignore_conflicts=True,
+        )
+    EnrollmentRollup.objects.filter(course_id=course_id, day=day).update(
+        enrollments=F("enrollments") + enrollments
+    )
+
+
+def enrollment_added(course_id, user_id, enrolled_on=None):
+    apply_enrollment_delta(course_id, 1)
+    apply_student_delta(course_id, user_id, 1)
+    apply_rollup_delta(course_id, timezone.localdate(enrolled_on), 1)
+
+
+def enrollment_removed(course_id, user_id, enrolled_on):
+    apply_enrollment_delta(course_id, -1)
+    apply_student_delta(course_id, user_id, -1)
+    apply_rollup_delta(course_id, timezone.localdate(enrolled_on), -1)
+
+
+def course_totals(courses):
+    # one conditional aggregate instead of a COUNT per state
+    return courses.aggregate(
+        total_courses=Count("pk"),
+        published_courses=Count("pk", filter=Q(is_published=True)),
+    )
+
+
+def refresh_instructor_courses(instructor_id, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    InstructorStats = apps.get_model("courses", "InstructorStats")
+
+    InstructorStats.objects.update_or_create(
+        instructor_id=instructor_id,
+        defaults=course_totals(Course.objects.filter(creator_id=instructor_id)),
+    )
+
+
+def _totals(chapters, key):
+    hours = chapters.values(key).annotate(
+        total=Sum("video_duration")
+    ).values("total")
+    count = chapters.values(key).annotate(
+        total=Count("pk")
+    ).values("total")
+    return {
+        "total_hours": Coalesce(Subquery(hours), Value(0.0)),
+        "chapter_count": Coalesce(Subquery(count), Value(0)),
+    }
+
+
+def rebuild_counters(courses=None, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    Section = apps.get_model("courses", "Section")
+    Chapter = apps.get_model("courses", "Chapter")
+
+    if courses is None:
+        courses = Course.objects.all()
+
+    Section.objects.filter(course__in=courses).update(
+        **_totals(
+            Chapter.objects.filter(section=OuterRef("pk")),
+            "section",
+        )
+    )
+    return courses.update(
+        **_totals(
+            Chapter.objects.filter(section__course=OuterRef("pk")),
+            "section__course",
+        )
+    )
+
+
+def rebuild_enrollment_counts(courses=None, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    Enrollment = apps.get_model("courses", "Enrollment")
+
+    if courses is None:
+        courses = Course.objects.all()
+
+    enrollments = Enrollment.objects.filter(
+        course=OuterRef("pk")
+    ).values("course").annotate(total=Count("pk")).values("total")
+
+    return courses.update(
+        enrollment_count=Coalesce(Subquery(enrollments), Value(0))
+    )
+
+
+def rebuild_instructor_stats(instructor_ids=None, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    Enrollment = apps.get_model("courses", "Enrollment")
+    InstructorStats = apps.get_model("courses", "InstructorStats")
+
+    if instructor_ids is None:
+        instructor_ids = Course.objects.values_list(
+            "creator_id", flat=True
+        ).distinct()
+
+    for instructor_id in instructor_ids:
+        enrollments = Enrollment.objects.filter(course__creator_id=instructor_id)
+
+        InstructorStats.objects.update_or_create(
+            instructor_id=instructor_id,
+            defaults={
+                **course_totals(Course.objects.filter(creator_id=instructor_id)),
+                **enrollments.aggregate(
+                    total_enrollments=Count("pk"),
+                    total_students=Count("user", distinct=True),
+                ),
+            },
+        )
+
+
+def rebuild_enrollment_rollups(courses=None, apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    Enrollment = apps.get_model("courses", "Enrollment")
+    EnrollmentRollup = apps.get_model("courses", "EnrollmentRollup")
+
+    if courses is None:
+        courses = Course.objects.all()
+
+    days = Enrollment.objects.filter(course__in=courses).annotate(
+        day=TruncDate("enrolled_on")
+    ).values("course_id", "day").annotate(total=Count("pk")).order_by()
+
+    EnrollmentRollup.objects.filter(course__in=courses).delete()
+    EnrollmentRollup.objects.bulk_create(
+        (
+            EnrollmentRollup(
+                course_id=row["course_id"], day=row["day"], enrollments=row["total"]
+            )
+            for row in days.iterator()
+        ),
+        batch_size=1000,
+    )
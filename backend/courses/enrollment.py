@@ -0,0 +1,162 @@
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from courses import counters
+from courses.models import Course, Enrollment
+
+CHUNK_SIZE = 1000
+
+
+def insert_enrollments(enrollments):
+    """
+    INSERT ... ON CONFLICT DO NOTHING (INSERT IGNORE on MySQL) for a list
+    of enrollments. Returns how many rows were written; concurrent
+    duplicates are ignored by the unique (user, course) key instead of
+    raising, and not counted.
+    """
+    using = router.db_for_write(Enrollment)
+    connection = connections[using]
+    fields = [
+        field for field in Enrollment._meta.concrete_fields
+        if not field.primary_key
+    ]
+    batch_size = max(connection.ops.bulk_batch_size(fields, enrollments), 1)
+
+    created = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(enrollments), batch_size):
+            query = InsertQuery(Enrollment, on_conflict=OnConflict.IGNORE)
+            query.insert_values(fields, enrollments[start:start + batch_size])
+            for sql, params in query.get_compiler(using).as_sql():
+                cursor.execute(sql, params)
+                created += max(cursor.rowcount, 0)
+    return created
+
+
+def insert_enrollment(enrollment):
+    """Whether ``enrollment`` was written, see insert_enrollments."""
+    return insert_enrollments([enrollment]) > 0
+
+
+def enroll(user_id, course_id):
+    """
+    Idempotently enroll a user. Returns (created, enrollment_count) where
+    the count includes this enrollment.
+    """
+    with transaction.atomic():
+        counters.lock_instructor_stats(course_id)
+        created = insert_enrollment(
+            Enrollment(user_id=user_id, course_id=course_id)
+        )
+        if created:
+            counters.enrollment_added(course_id, user_id)
+
+        count = Course.objects.filter(pk=course_id).values_list(
+            "enrollment_count", flat=True
+        ).get()
+
+    return created, count
+
+
+def iter_csv_emails(lines):
+    # a header row is optional; without one the first column is used
+    column = 0
+    for index, row in enumerate(csv.reader(lines)):
+        if not row:
+            continue
+        if index == 0 and "email" in (cell.strip().lower() for cell in row):
+            column = [cell.strip().lower() for cell in row].index("email")
+            continue
+        if column < len(row):
+            yield row[column]
+
+
+def iter_jsonl_emails(lines):
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {number} is not valid JSON")
+        yield record.get("email", "") if isinstance(record, dict) else str(record)
+
+
+def iter_emails(lines, format):
+    """
+    Lazily read emails from an iterable of text lines in "csv" or "jsonl"
+    format, so uploads and files are never held in memory as a whole.
+    """
+    readers = {"csv": iter_csv_emails, "jsonl": iter_jsonl_emails}
+    if format not in readers:
+        raise ValueError(f"Unsupported format {format!r}, use csv or jsonl")
+
+    for email in readers[format](lines):
+        email = email.strip()
+        if email:
+            yield email
+
+
+class BulkEnrollError(ValueError):
+    """The input failed to parse after ``result`` had already been enrolled."""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
+def bulk_enroll(course, emails, chunk_size=CHUNK_SIZE):
+    """
+    Enroll the users behind ``emails`` into ``course`` chunk by chunk:
+    one user lookup, one enrollment lookup and one insert-or-ignore bulk
+    insert per chunk. Returns created/skipped/unknown counts.
+
+    Each chunk is committed as it goes. Input that fails to parse raises
+    BulkEnrollError with the counts of the chunks before it, which stay
+    enrolled and are counted.
+    """
+    User = get_user_model()
+    result = {"created": 0, "skipped": 0, "unknown": 0}
+
+    emails = iter(emails)
+    try:
+        while chunk := set(islice(emails, chunk_size)):
+            users = dict(
+                User.objects.filter(email__in=chunk).values_list("email", "pk")
+            )
+            result["unknown"] += len(chunk) - len(users)
+
+            # the creator has access without enrolling
+            user_ids = set(users.values()) - {course.creator_id}
+            enrolled = set(
+                Enrollment.objects.filter(
+                    course=course, user_id__in=user_ids
+                ).values_list("user_id", flat=True)
+            )
+
+            # concurrent enrollments may win some of the rows; only count
+            # the ones written here
+            created = insert_enrollments(
+                [Enrollment(user_id=user_id, course=course) for user_id in user_ids - enrolled]
+            )
+
+            if created:
+                counters.apply_rollup_delta(course.pk, timezone.localdate(), created)
+            result["created"] += created
+            result["skipped"] += len(users) - created
+    except ValueError as exc:
+        raise BulkEnrollError(str(exc), result) from exc
+    finally:
+        # bulk inserts skip the Enrollment signals, so recount once at the
+        # end, also after a parse error
+        counters.rebuild_enrollment_counts(Course.objects.filter(pk=course.pk))
+        counters.rebuild_instructor_stats([course.creator_id])
+    return result
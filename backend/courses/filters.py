@@ -0,0 +1,16 @@
+from rest_framework.filters import BaseFilterBackend
+
+from courses.search import search_courses
+
+
+class CourseSearchFilter(BaseFilterBackend):
+    search_param = "search"
+
+    def get_search_query(self, request):
+        return request.query_params.get(self.search_param, "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        return search_courses(queryset, query)
@@ -0,0 +1,151 @@
+"""
+Concurrent load on the read endpoints, through the WSGI application and
+through the ASGI one, where they are async views (see backend.asgi_urls).
+
+Every connection sends its requests one after the other, and reading each
+response takes the client ``delay`` seconds, as on a slow mobile link. A
+WSGI worker thread is busy until the client has read everything, so
+connections beyond the thread count wait in line. The ASGI worker awaits
+the client instead and serves them all from one event loop.
+"""
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import AsyncRequestFactory, RequestFactory
+
+from courses.benchmark import SCENARIOS, Fixture, percentile
+
+ENDPOINTS = ["catalog", "course_detail", "learn", "my_enrollments"]
+
+
+def build_requests(fixture, name, count):
+    """(method, path, headers) of ``count`` requests of scenario ``name``."""
+    build = next(build for build in SCENARIOS if build.__name__ == name)
+    requests = []
+    for i in range(count):
+        method, path, user, _ = build(fixture, i)
+        headers = {} if user is None else {"Authorization": f"Bearer {fixture.token(user)}"}
+        requests.append((method, path, headers))
+    return requests
+
+
+def summarize(results, elapsed):
+    timings = [duration * 1000 for _, duration in results]
+    statuses = Counter(status for status, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def load_wsgi(requests, connections, threads, delay):
+    application = WSGIHandler()
+    factory = RequestFactory()
+
+    def handle(method, path, headers, queued):
+        statuses = []
+        environ = getattr(factory, method)(path, headers=headers).environ
+        body = application(environ, lambda status, *args: statuses.append(status))
+        try:
+            for _ in body:
+                pass
+            # the worker writes the response out at the client's pace
+            time.sleep(delay)
+        finally:
+            body.close()
+        return int(statuses[0].split()[0]), time.perf_counter() - queued
+
+    def connection(workers):
+        return [
+            workers.submit(handle, method, path, headers, time.perf_counter()).result()
+            for method, path, headers in requests
+        ]
+
+    with ThreadPoolExecutor(threads) as workers, ThreadPoolExecutor(connections) as clients:
+        started = time.perf_counter()
+        futures = [clients.submit(connection, workers) for _ in range(connections)]
+        results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - started
+
+    return summarize(results, elapsed)
+
+
+async def _asgi_connection(application, factory, requests, delay):
+    results = []
+    for method, path, headers in requests:
+        scope = getattr(factory, method)(path, headers=headers).scope
+        status = None
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # the client never disconnects; Django stops listening once it
+            # has responded
+            await asyncio.get_running_loop().create_future()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body"):
+                await asyncio.sleep(delay)
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        results.append((status, time.perf_counter() - started))
+    return results
+
+
+async def _load_asgi(requests, connections, delay):
+    from backend.asgi import AsyncRoutesHandler
+
+    application = AsyncRoutesHandler()
+    factory = AsyncRequestFactory()
+
+    started = time.perf_counter()
+    batches = await asyncio.gather(*(
+        _asgi_connection(application, factory, requests, delay) for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+
+    return summarize([result for batch in batches for result in batch], elapsed)
+
+
+def load_asgi(requests, connections, delay):
+    return asyncio.run(_load_asgi(requests, connections, delay))
+
+
+def run(ids, connections=50, requests=10, threads=4, delay=0.05, endpoints=ENDPOINTS):
+    """
+    Put each endpoint under ``connections`` concurrent connections of
+    ``requests`` requests each, first through WSGI with ``threads`` worker
+    threads, then through ASGI. Caches are warm: every endpoint is
+    requested once through both beforehand.
+    """
+    fixture = Fixture(ids)
+
+    results = {}
+    for name in endpoints:
+        batch = build_requests(fixture, name, requests)
+        load_wsgi(batch[:1], 1, 1, 0)
+        load_asgi(batch[:1], 1, 0)
+
+        method, path, _ = batch[0]
+        results[name] = {
+            "method": method.upper(),
+            "path": path,
+            "wsgi": load_wsgi(batch, connections, threads, delay),
+            "asgi": load_asgi(batch, connections, delay),
+        }
+    return results
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.counters import rebuild_enrollment_rollups
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily enrollment rollups of courses from their enrollments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "course_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these courses (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by("pk")
+
+        if options["course_ids"]:
+            courses = courses.filter(pk__in=options["course_ids"])
+
+        count = 0
+        for course_id in courses.values_list("pk", flat=True).iterator():
+            # one transaction per course keeps the rewrite of each short
+            with transaction.atomic():
+                rebuild_enrollment_rollups(Course.objects.filter(pk=course_id))
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt enrollment rollups for {count} courses."))
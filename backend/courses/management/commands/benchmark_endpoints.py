@@ -0,0 +1,95 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from courses import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with a synthetic dataset and measure "
+        "p50/p95 latency and queries per request of every API endpoint. Runs "
+        "on the configured database; use --settings=backend.settings_sqlite "
+        "for SQLite."
+    )
+
+    def add_arguments(self, parser):
+        benchmark.add_dataset_arguments(parser)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the caches before every request",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+
+        dataset = {name: options[name] for name in [*benchmark.DATASET, "seed"]}
+        run_options = {name: options[name] for name in ("iterations", "warmup", "cold")}
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        setup_test_environment(debug=False)
+        try:
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                MEDIA_ROOT=media,
+                # render thumbnails inline instead of in worker threads
+                THUMBNAILS={**getattr(settings, "THUMBNAILS", {}), "BACKGROUND": False},
+            ):
+                ids = benchmark.seed(**dataset)
+                endpoints, missing = benchmark.run(ids, **run_options)
+                result = benchmark.report(dataset, endpoints, missing, **run_options)
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.write_table(result, baseline)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(result, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        for route in missing:
+            self.stderr.write(self.style.WARNING(f"Not benchmarked: {route}"))
+
+    def write_table(self, result, baseline):
+        database = result["database"]
+        self.stdout.write(
+            f"{database['vendor']} {database['version']}, commit {result['commit'] or 'unknown'}"
+        )
+        width = max(map(len, result["endpoints"]))
+        self.stdout.write(f"{'endpoint':<{width}} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'errors':>7}")
+
+        for key, row in result["endpoints"].items():
+            self.stdout.write(
+                f"{key:<{width}} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['queries']:>8} {row['errors']:>7}"
+            )
+
+        if baseline is None:
+            return
+
+        self.stdout.write(f"\nCompared with {baseline['commit'] or 'baseline'} ({baseline['database']['vendor']}):")
+        for key, before, after in benchmark.compare(baseline, result):
+            change = (after["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+            queries = after["queries"] - before["queries"]
+            self.stdout.write(f"{key:<{width}} p50 {change:+7.1f}%  queries {queries:+d}")
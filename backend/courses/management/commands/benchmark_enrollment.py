@@ -0,0 +1,127 @@
+import random
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from courses.enrollment import enroll
+from courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        "Enroll many users into one course from concurrent threads against "
+        "a throwaway test database and report errors and throughput"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=50)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=2,
+            help="Enroll every user this many times to exercise duplicates",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            # worker threads need a database file they can all open; the
+            # default in-memory test database is private to one connection
+            directory = tempfile.mkdtemp(prefix="enroll-bench-")
+            connection.settings_dict["TEST"]["NAME"] = f"{directory}/test.sqlite3"
+            # SQLite has a single writer; let threads queue for the lock
+            # instead of giving up after the default five seconds
+            connection.settings_dict["OPTIONS"].setdefault("timeout", 60)
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            result = self.run_benchmark(**options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for key, value in result.items():
+            self.stdout.write(f"{key}: {value}")
+
+        if result["errors"] or not result["consistent"]:
+            raise CommandError("Enrollment benchmark failed")
+        self.stdout.write(self.style.SUCCESS("No errors, counts consistent."))
+
+    def run_benchmark(self, users, threads, repeat, seed, **options):
+        User = get_user_model()
+        password = make_password(None)
+
+        creator = User.objects.create(
+            email="creator@bench.local", user_name="creator", password=password
+        )
+        course = Course.objects.create(
+            creator=creator, title="Benchmark", description="", is_published=True
+        )
+        User.objects.bulk_create(
+            User(email=f"student{i}@bench.local", user_name=f"student{i}", password=password)
+            for i in range(users)
+        )
+        user_ids = list(
+            User.objects.exclude(pk=creator.pk).values_list("pk", flat=True)
+        )
+
+        attempts = user_ids * repeat
+        random.Random(seed).shuffle(attempts)
+        chunks = [attempts[i::threads] for i in range(threads)]
+
+        created = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(chunk):
+            count, failures = 0, []
+            try:
+                barrier.wait()
+                for user_id in chunk:
+                    try:
+                        count += enroll(user_id, course.pk)[0]
+                    except Exception as exc:
+                        failures.append(repr(exc))
+            finally:
+                connections[DEFAULT_DB_ALIAS].close()
+                with lock:
+                    created.append(count)
+                    errors.extend(failures)
+
+        workers = [
+            threading.Thread(target=worker, args=(chunk,)) for chunk in chunks
+        ]
+        for thread in workers:
+            thread.start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        course.refresh_from_db()
+        rows = Enrollment.objects.filter(course=course).count()
+
+        return {
+            "database": connection.vendor,
+            "users": users,
+            "threads": threads,
+            "attempts": len(attempts),
+            "created": sum(created),
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "enrollment_rows": rows,
+            "enrollment_count": course.enrollment_count,
+            "consistent": rows == sum(created) == course.enrollment_count == users,
+            "seconds": round(elapsed, 3),
+            "attempts_per_second": round(len(attempts) / elapsed, 1),
+        }
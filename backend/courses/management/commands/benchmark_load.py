@@ -0,0 +1,100 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from courses import benchmark, load_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and put the catalog and learning read "
+        "endpoints under concurrent slow clients, through the WSGI application "
+        "(sync views, a fixed number of worker threads) and through the ASGI "
+        "one (async views, one event loop). Reports throughput and p50/p95 "
+        "latency of both."
+    )
+
+    def add_arguments(self, parser):
+        benchmark.add_dataset_arguments(parser)
+        parser.add_argument("--connections", type=int, default=50, help="Concurrent clients")
+        parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+        parser.add_argument("--threads", type=int, default=4, help="WSGI worker threads")
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=50,
+            help="Milliseconds each client takes to read a response",
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=load_benchmark.ENDPOINTS,
+            help="Only this endpoint; may be repeated",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        for name in ("connections", "requests", "threads"):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be at least 1")
+
+        dataset = {name: options[name] for name in [*benchmark.DATASET, "seed"]}
+        run_options = {
+            "connections": options["connections"],
+            "requests": options["requests"],
+            "threads": options["threads"],
+            "delay": options["client_delay"] / 1000,
+        }
+
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        setup_test_environment(debug=False)
+        try:
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                MEDIA_ROOT=media,
+                THUMBNAILS={**getattr(settings, "THUMBNAILS", {}), "BACKGROUND": False},
+            ):
+                ids = benchmark.seed(**dataset)
+                endpoints = load_benchmark.run(
+                    ids, endpoints=options["endpoint"] or load_benchmark.ENDPOINTS, **run_options
+                )
+                result = benchmark.report(dataset, endpoints, [], **run_options)
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.write_table(result)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(result, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def write_table(self, result):
+        database = result["database"]
+        options = result["options"]
+        self.stdout.write(
+            f"{database['vendor']} {database['version']}, commit {result['commit'] or 'unknown'}; "
+            f"{options['connections']} connections x {options['requests']} requests, "
+            f"{options['delay'] * 1000:g} ms per response read, {options['threads']} WSGI threads"
+        )
+        self.stdout.write(
+            f"{'endpoint':<16} {'server':<6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}"
+        )
+
+        for name, row in result["endpoints"].items():
+            for server in ("wsgi", "asgi"):
+                stats = row[server]
+                self.stdout.write(
+                    f"{name:<16} {server:<6} {stats['throughput_rps']:>8.1f} "
+                    f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['errors']:>7}"
+                )
@@ -0,0 +1,53 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.enrollment import CHUNK_SIZE, BulkEnrollError, bulk_enroll, iter_emails
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Enroll a cohort of users into a course from a CSV or JSONL file of emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_id", type=int)
+        parser.add_argument("path", help="File to read, or - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format (default: from the file extension)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options["course_id"])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course {options['course_id']} does not exist")
+
+        path = options["path"]
+        format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+
+        try:
+            if path == "-":
+                result = self.enroll(course, sys.stdin, format, options["chunk_size"])
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as lines:
+                    result = self.enroll(course, lines, format, options["chunk_size"])
+        except BulkEnrollError as exc:
+            result = exc.result
+            raise CommandError(
+                f"{exc} (created {result['created']} enrollments before it, "
+                f"skipped {result['skipped']}, {result['unknown']} unknown emails)"
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} enrollments, skipped {result['skipped']} "
+            f"already enrolled, {result['unknown']} unknown emails."
+        ))
+
+    def enroll(self, course, lines, format, chunk_size):
+        return bulk_enroll(course, iter_emails(lines, format), chunk_size)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from courses import thumbnails
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnail derivatives for courses with an uploaded thumbnail"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "course_ids",
+            nargs="*",
+            type=int,
+            help="Only these courses (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.exclude(thumbnail="").exclude(thumbnail=None)
+
+        if options["course_ids"]:
+            courses = courses.filter(pk__in=options["course_ids"])
+
+        count = 0
+        for course_id in courses.values_list("pk", flat=True).iterator():
+            thumbnails.generate(course_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {count} courses."))
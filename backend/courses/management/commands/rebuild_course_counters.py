@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.counters import (
+    rebuild_counters,
+    rebuild_enrollment_counts,
+    rebuild_instructor_stats,
+)
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored course, section and instructor counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "course_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these courses (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+
+        if options["course_ids"]:
+            courses = courses.filter(pk__in=options["course_ids"])
+
+        with transaction.atomic():
+            updated = rebuild_counters(courses)
+            rebuild_enrollment_counts(courses)
+            rebuild_instructor_stats(
+                courses.values_list("creator_id", flat=True).distinct()
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} courses."))
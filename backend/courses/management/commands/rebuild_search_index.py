@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.search import get_search_backend, rebuild_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course search documents from published courses"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_documents()
+
+        get_search_backend().reset()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} published courses."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.models import Chapter, Course, Section
+from courses.ordering import renormalize
+
+
+class Command(BaseCommand):
+    help = "Respace the sort keys of sections and chapters so middle inserts stay single-row writes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "course_ids",
+            nargs="*",
+            type=int,
+            help="Only renormalize these courses (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by("pk")
+
+        if options["course_ids"]:
+            courses = courses.filter(pk__in=options["course_ids"])
+
+        count = 0
+        for course_id in courses.values_list("pk", flat=True).iterator():
+            # one short transaction per course keeps row locks brief
+            with transaction.atomic():
+                renormalize(Section.objects.filter(course_id=course_id))
+
+                section_ids = Section.objects.filter(
+                    course_id=course_id
+                ).values_list("pk", flat=True)
+                for section_id in section_ids:
+                    renormalize(Chapter.objects.filter(section_id=section_id))
+
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Renormalized ordering for {count} courses."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from courses import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic dataset of instructors, courses, "
+        "sections, chapters, students and enrollments"
+    )
+
+    def add_arguments(self, parser):
+        benchmark.add_dataset_arguments(parser)
+        parser.add_argument(
+            "--prefix",
+            default="bench",
+            help="Prefix for the generated e-mail addresses (default: bench)",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options.pop("prefix")
+        if User.objects.filter(email__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users prefixed '{prefix}-' already exist; pick another --prefix")
+
+        dataset = {name: options[name] for name in [*benchmark.DATASET, "seed"]}
+        ids = benchmark.seed(prefix=prefix, **dataset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(ids['instructors'])} instructors, {len(ids['courses'])} courses "
+            f"({len(ids['published'])} published) and {len(ids['students'])} students. "
+            f"Every user's password is '{benchmark.PASSWORD}'."
+        ))
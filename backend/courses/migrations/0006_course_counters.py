@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    from courses.counters import rebuild_counters
+
+    rebuild_counters(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_remove_course_total_hours_alter_course_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='chapter_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_hours',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='chapter_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='total_hours',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
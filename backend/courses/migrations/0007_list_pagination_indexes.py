@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_published', 'created_at', 'id'], name='course_published_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', 'enrolled_on'], name='enrollment_user_enrolled_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX course_search_fulltext "
+        "ON courses_coursesearchdocument (title, body)"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        "DROP INDEX course_search_fulltext ON courses_coursesearchdocument"
+    )
+
+
+def populate_documents(apps, schema_editor):
+    from courses.search import rebuild_documents
+
+    rebuild_documents(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='courses.course')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+def spread_sort_keys(apps, schema_editor):
+    from courses.ordering import GAP, apply_sort_keys
+
+    Section = apps.get_model("courses", "Section")
+    Chapter = apps.get_model("courses", "Chapter")
+
+    for model, parent in ((Section, "course_id"), (Chapter, "section_id")):
+        rows = model.objects.order_by(parent, "sort_key", "id").values_list(
+            parent, "id"
+        )
+
+        keys = {}
+        current, position = None, 0
+        for parent_id, pk in rows.iterator():
+            if parent_id != current:
+                current, position = parent_id, 0
+            position += 1
+            keys[pk] = position * GAP
+
+        apply_sort_keys(model.objects.all(), keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_course_search_document'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='section',
+            old_name='order',
+            new_name='sort_key',
+        ),
+        migrations.RenameField(
+            model_name='chapter',
+            old_name='order',
+            new_name='sort_key',
+        ),
+        migrations.RunPython(spread_sort_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='section',
+            name='sort_key',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='sort_key',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterModelOptions(
+            name='section',
+            options={'ordering': ['sort_key', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='chapter',
+            options={'ordering': ['sort_key', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['course', 'sort_key'], name='section_course_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['section', 'sort_key'], name='chapter_section_sort_idx'),
+        ),
+    ]
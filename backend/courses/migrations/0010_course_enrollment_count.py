@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+def populate_enrollment_counts(apps, schema_editor):
+    from courses.counters import rebuild_enrollment_counts
+
+    rebuild_enrollment_counts(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_sparse_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_enrollment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_instructor_stats(apps, schema_editor):
+    from courses.counters import rebuild_instructor_stats
+
+    rebuild_instructor_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_permission_version'),
+        ('courses', '0010_course_enrollment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstructorStats',
+            fields=[
+                ('instructor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='instructor_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_courses', models.PositiveIntegerField(default=0)),
+                ('published_courses', models.PositiveIntegerField(default=0)),
+                ('total_enrollments', models.PositiveIntegerField(default=0)),
+                ('total_students', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_instructor_stats, migrations.RunPython.noop),
+    ]
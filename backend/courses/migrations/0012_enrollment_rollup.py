@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    from courses.counters import rebuild_enrollment_rollups
+
+    rebuild_enrollment_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_instructor_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_rollups', to='courses.course')),
+            ],
+            options={
+                'unique_together': {('course', 'day')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_chapter_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_chapter',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.chapter'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_position',
+            field=models.FloatField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_enrollment_last_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+
+from courses import counters
+from courses.ordering import PositionedModel
 
 User = settings.AUTH_USER_MODEL
 
 
+class CourseQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related("creator")
+
+
 class Course(models.Model):
     creator = models.ForeignKey(
         User,
@@ -15,37 +23,77 @@ class Course(models.Model):
     thumbnail = models.ImageField(upload_to="thumbnails/", null=True, blank=True)
     requirements = models.TextField(blank=True)
     is_published = models.BooleanField(default=False)
+    # content hash naming the resized copies, see courses.thumbnails
+    thumbnail_hash = models.CharField(max_length=16, blank=True, editable=False)
+
+    # maintained incrementally by Chapter writes, see courses.counters
+    total_hours = models.FloatField(default=0, editable=False)
+    chapter_count = models.PositiveIntegerField(default=0, editable=False)
+    # maintained by courses.enrollment and the Enrollment signals
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["is_published", "created_at", "id"],
+                name="course_published_created_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets the signals tell publish toggles apart from other edits
+        instance._tracked_published = instance.__dict__.get("is_published")
+        instance._tracked_thumbnail = instance.__dict__.get("thumbnail")
+        return instance
+
+    def save(self, *args, **kwargs):
+        # derivatives belong to the previous image until regenerated
+        self._thumbnail_changed = (
+            (self.thumbnail.name or None)
+            != (getattr(self, "_tracked_thumbnail", None) or None)
+        )
+        if self._thumbnail_changed:
+            self.thumbnail_hash = ""
+
+        super().save(*args, **kwargs)
+        # after the post_save receivers, which compare against them
+        self._tracked_published = self.is_published
+        self._tracked_thumbnail = self.thumbnail.name
+
     def __str__(self):
         return self.title
 
 
-class Section(models.Model):
+class Section(PositionedModel):
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
         related_name="sections"
     )
     title = models.CharField(max_length=255)
-    order = models.PositiveIntegerField(null=True, blank=True)
 
-    class Meta:
-        ordering = ["order"]
+    total_hours = models.FloatField(default=0, editable=False)
+    chapter_count = models.PositiveIntegerField(default=0, editable=False)
 
-    def save(self, *args, **kwargs):
-        if not self.pk:
-            sections = Section.objects.filter(course=self.course)
-            count = sections.count()
+    class Meta(PositionedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=["course", "sort_key"],
+                name="section_course_sort_idx",
+            ),
+        ]
 
-            if not self.order or self.order > count + 1:
-                self.order = count + 1
-            else:
-                sections.filter(order__gte=self.order).update(
-                    order=models.F("order") + 1
-                )
+    def get_siblings(self):
+        return Section.objects.filter(course_id=self.course_id)
 
+    def save(self, *args, **kwargs):
+        self.assign_sort_key()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -53,7 +101,7 @@ class Section(models.Model):
 
 
 
-class Chapter(models.Model):
+class Chapter(PositionedModel):
     section = models.ForeignKey(
         Section,
         on_delete=models.CASCADE,
@@ -62,40 +110,71 @@ class Chapter(models.Model):
     title = models.CharField(max_length=255)
     video_url = models.URLField()
     video_duration = models.FloatField(help_text="Duration in hours")
-    order = models.PositiveIntegerField(null=True, blank=True)
 
-    class Meta:
-        ordering = ["order"]
+    class Meta(PositionedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=["section", "sort_key"],
+                name="chapter_section_sort_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked = (
+            instance.__dict__.get("section_id"),
+            instance.__dict__.get("video_duration"),
+        )
+        return instance
+
+    def get_siblings(self):
+        return Chapter.objects.filter(section_id=self.section_id)
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            chapters = Chapter.objects.filter(section=self.section)
-            count = chapters.count()
+        with transaction.atomic():
+            previous = getattr(self, "_tracked", None)
 
-            if not self.order or self.order > count + 1:
-                self.order = count + 1
-            else:
-                chapters.filter(order__gte=self.order).update(
-                    order=models.F("order") + 1
-                )
+            if self._state.adding:
+                previous = None
+            elif previous is None or None in previous:
+                previous = Chapter.objects.filter(pk=self.pk).values_list(
+                    "section_id", "video_duration"
+                ).first()
 
-        super().save(*args, **kwargs)
+            # a chapter moved to another section goes to its end unless
+            # a position was asked for
+            self.assign_sort_key(
+                moved=previous is not None and previous[0] != self.section_id
+            )
 
-        course = self.section.course
-        total = Chapter.objects.filter(
-            section__course=course
-        ).aggregate(
-            total=models.Sum("video_duration")
-        )["total"] or 0
+            super().save(*args, **kwargs)
 
-        course.total_hours = total
-        course.save()
+            counters.chapter_saved(self, previous)
+            self._tracked = (self.section_id, self.video_duration)
 
     def __str__(self):
         return self.title
 
 
 
+class CourseSearchDocument(models.Model):
+    # denormalized text of a published course, kept in sync by
+    # courses.search and covered by a FULLTEXT index on MySQL
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document"
+    )
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
 class Enrollment(models.Model):
     STATUS_CHOICES = (
         ("active", "Active"),
@@ -118,9 +197,95 @@ class Enrollment(models.Model):
         default="active"
     )
     enrolled_on = models.DateTimeField(auto_now_add=True)
+    # chapters marked completed, maintained by courses.progress
+    completed_chapters = models.PositiveIntegerField(default=0, editable=False)
+    # latest heartbeat, for resuming where the student left off
+    last_chapter = models.ForeignKey(
+        "Chapter",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+"
+    )
+    last_position = models.FloatField(default=0, editable=False)
 
     class Meta:
         unique_together = ("user", "course")
+        indexes = [
+            models.Index(
+                fields=["user", "enrolled_on"],
+                name="enrollment_user_enrolled_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} -> {self.course}"
+
+
+class InstructorStats(models.Model):
+    # maintained incrementally by courses.counters; read by the dashboard
+    instructor = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="instructor_stats"
+    )
+    total_courses = models.PositiveIntegerField(default=0)
+    published_courses = models.PositiveIntegerField(default=0)
+    total_enrollments = models.PositiveIntegerField(default=0)
+    total_students = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.instructor_id}"
+
+
+class EnrollmentRollup(models.Model):
+    # enrollments per course and day, maintained by courses.counters
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="enrollment_rollups"
+    )
+    day = models.DateField()
+    enrollments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("course", "day")
+
+    def __str__(self):
+        return f"{self.course_id} {self.day}: {self.enrollments}"
+
+
+class ChapterProgress(models.Model):
+    # written in batches by courses.progress from learner heartbeats
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="chapter_progress"
+    )
+    chapter = models.ForeignKey(
+        Chapter,
+        on_delete=models.CASCADE,
+        related_name="progress"
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="chapter_progress"
+    )
+    position = models.FloatField(default=0, help_text="Seconds into the video")
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "chapter")
+        indexes = [
+            models.Index(
+                fields=["user", "course"],
+                name="progress_user_course_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.chapter_id}: {self.position}"
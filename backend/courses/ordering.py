@@ -0,0 +1,110 @@
+from django.db import models
+from django.db.models import Case, Max, Q, Value, When
+
+# spacing between neighbouring sort keys; a run of middle inserts at the
+# same spot can halve it ~16 times before the siblings are renormalized
+GAP = 1 << 16
+
+# one CASE statement per batch keeps the statement size bounded
+BATCH_SIZE = 500
+
+
+def apply_sort_keys(queryset, keys):
+    pks = list(keys)
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = pks[start:start + BATCH_SIZE]
+        queryset.filter(pk__in=batch).update(
+            sort_key=Case(
+                *[When(pk=pk, then=Value(keys[pk])) for pk in batch],
+                output_field=models.BigIntegerField(),
+            )
+        )
+
+
+def renormalize(siblings):
+    pks = siblings.order_by("sort_key", "pk").values_list("pk", flat=True)
+    apply_sort_keys(
+        siblings, {pk: (index + 1) * GAP for index, pk in enumerate(pks)}
+    )
+
+
+def key_for_position(siblings, position=None):
+    """
+    Return a sort_key that places a row at the 1-based dense ``position``
+    among ``siblings`` (which must not include the row itself), or after
+    the last sibling when ``position`` is None. Only the row being placed
+    is written, except when the gap is exhausted and the siblings get
+    renormalized.
+    """
+    siblings = siblings.order_by("sort_key", "pk")
+
+    if position is None:
+        last = siblings.aggregate(last=Max("sort_key"))["last"]
+        return GAP if last is None else last + GAP
+
+    if position <= 1:
+        first = siblings.values_list("sort_key", flat=True).first()
+        return GAP if first is None else first - GAP
+
+    keys = list(siblings.values_list("sort_key", flat=True)[position - 2:position])
+
+    if not keys:
+        return key_for_position(siblings)
+    if len(keys) == 1:
+        return keys[0] + GAP
+
+    before, after = keys
+    if after - before < 2:
+        renormalize(siblings)
+        return key_for_position(siblings, position)
+    return (before + after) // 2
+
+
+class PositionedModel(models.Model):
+    """
+    Rows ordered within their parent by a sparse ``sort_key``. The API
+    works with dense 1..n positions through the ``order`` property: it is
+    read from ``_position`` when a loader has set it (see courses.tree),
+    computed with one COUNT otherwise, and assigning it moves the row on
+    the next save.
+    """
+
+    sort_key = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+        ordering = ["sort_key", "id"]
+
+    def get_siblings(self):
+        """The rows sharing this row's parent, this one included."""
+        raise NotImplementedError(
+            f"{type(self).__name__} must define get_siblings() to be positioned"
+        )
+
+    @property
+    def order(self):
+        position = getattr(self, "_position", None)
+        if position is None and self.pk is not None:
+            position = self.get_siblings().filter(
+                Q(sort_key__lt=self.sort_key)
+                | Q(sort_key=self.sort_key, pk__lt=self.pk)
+            ).count() + 1
+            self._position = position
+        return position
+
+    @order.setter
+    def order(self, value):
+        self._requested_position = value
+        self._position = None
+
+    def assign_sort_key(self, moved=False):
+        requested = getattr(self, "_requested_position", None)
+
+        if self._state.adding or moved or requested is not None:
+            siblings = self.get_siblings()
+            if self.pk is not None:
+                siblings = siblings.exclude(pk=self.pk)
+
+            self.sort_key = key_for_position(siblings, requested)
+            self._requested_position = None
+            self._position = None
@@ -0,0 +1,74 @@
+from courses import response_cache
+from courses.models import Chapter
+
+
+class CourseOutline:
+    """
+    A course's chapters flattened in reading order across sections, with
+    an index from chapter id to its global position. Cached under the
+    course's response cache version, so any change to the tree (which
+    bumps that version) replaces it.
+    """
+
+    def __init__(self, chapters):
+        self.chapters = chapters
+        self.index = {chapter["id"]: i for i, chapter in enumerate(chapters)}
+
+    def __len__(self):
+        return len(self.chapters)
+
+    def at(self, position):
+        if 0 <= position < len(self.chapters):
+            return self.chapters[position]
+        return None
+
+    def position_of(self, chapter_id):
+        return self.index.get(chapter_id)
+
+
+def build_outline(course_id):
+    chapters = Chapter.objects.filter(section__course_id=course_id).order_by(
+        "section__sort_key", "section_id", "sort_key", "id"
+    ).values(
+        "id", "title", "video_url", "video_duration", "section_id", "section__title"
+    )
+
+    return CourseOutline([
+        {
+            "id": chapter["id"],
+            "title": chapter["title"],
+            "video_url": chapter["video_url"],
+            "video_duration": chapter["video_duration"],
+            "section": {"id": chapter["section_id"], "title": chapter["section__title"]},
+            "position": position,
+        }
+        for position, chapter in enumerate(chapters, start=1)
+    ])
+
+
+def get_outline(course_id):
+    cache = response_cache.get_cache()
+    key = f"courses:outline:{course_id}:{response_cache.course_version(course_id)}"
+
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_outline(course_id)
+        cache.set(key, outline, response_cache.get_options()["TIMEOUT"])
+    return outline
+
+
+def resume_position(outline, last_chapter_id, completed_ids):
+    """
+    Global position to continue from: the last chapter watched if it is
+    unfinished, otherwise the first unfinished chapter after it, wrapping
+    around to catch skipped ones. None when everything is completed.
+    """
+    start = outline.position_of(last_chapter_id)
+    if start is None:
+        start = 0
+
+    for offset in range(len(outline)):
+        position = (start + offset) % len(outline)
+        if outline.at(position)["id"] not in completed_ids:
+            return position
+    return None
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-method pagination over a composite, unique ordering.
+
+    Each page is fetched with a ``WHERE (created_at, id) < (...)`` style
+    predicate instead of an OFFSET, so page N costs the same as page 1.
+    Views may override the ordering with a ``keyset_ordering`` attribute;
+    its last field must be unique (normally ``id``).
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("-created_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 20
+        max_page_size = getattr(settings, "PAGINATION_MAX_PAGE_SIZE", 100)
+
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            requested = page_size
+
+        if requested <= 0:
+            requested = page_size
+
+        return min(requested, max_page_size)
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, "keyset_ordering", self.ordering))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        # one row past the page tells whether there is a next one
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.cursor = self.decode_cursor(request, queryset)
+
+        ordering = self.ordering
+        if self.cursor and self.cursor["reverse"]:
+            ordering = tuple(_invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(
+                _seek_predicate(ordering, self.cursor["position"])
+            )
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.cursor and self.cursor["reverse"]:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        position = [
+            _serialize(getattr(obj, field.lstrip("-")))
+            for field in self.ordering
+        ]
+        payload = json.dumps(
+            {"p": position, "r": int(reverse)},
+            separators=(",", ":"),
+        )
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            position = payload["p"]
+            reverse = bool(payload["r"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [
+                _output_field(queryset, field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            # well-formed cursors carrying values of the wrong type
+            raise NotFound(self.invalid_cursor_message)
+
+        return {"position": position, "reverse": reverse}
+
+    def to_html(self):
+        return ""
+
+
+def _invert(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _seek_predicate(ordering, position):
+    # (a, b, c) after (x, y, z) ==
+    #   a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    predicate = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        predicate |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return predicate
+
+
+def _output_field(queryset, name):
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def _serialize(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
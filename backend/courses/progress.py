@@ -0,0 +1,280 @@
+import atexit
+import logging
+import threading
+import time
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.models import Chapter, ChapterProgress, Course, Enrollment
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # flush once this many (user, chapter) entries are pending ...
+    "MAX_PENDING": 500,
+    # ... or once the oldest pending heartbeat is this many seconds old, by
+    # a timer even when no further heartbeat arrives
+    "FLUSH_INTERVAL": 10,
+    # alias from CACHES remembering which chapters a user may report on
+    "CACHE": "default",
+    "ACCESS_TIMEOUT": 300,
+}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "PROGRESS_BUFFER", {})}
+
+
+def can_track(user_id, course_id, chapter_id):
+    options = get_options()
+    cache = caches[options["CACHE"]]
+    key = f"courses:progress:access:{user_id}:{course_id}:{chapter_id}"
+
+    if cache.get(key):
+        return True
+
+    allowed = Chapter.objects.filter(
+        pk=chapter_id,
+        section__course_id=course_id,
+        section__course__enrollments__user_id=user_id,
+    ).exists()
+    if allowed:
+        cache.set(key, True, options["ACCESS_TIMEOUT"])
+    return allowed
+
+
+def write_progress(pending):
+    """
+    Upsert buffered progress, {(user_id, chapter_id): entry}, in bulk
+    statements, then recount the completed chapters and set the last
+    watched chapter of the affected enrollments and mark the ones that
+    reached the course's chapter_count.
+    """
+    # chapters can be deleted while their heartbeats wait in the buffer
+    existing = set(
+        Chapter.objects.filter(
+            pk__in={chapter_id for _, chapter_id in pending}
+        ).order_by().values_list("pk", flat=True)
+    )
+    pending = {
+        key: entry for key, entry in pending.items() if key[1] in existing
+    }
+    if not pending:
+        return
+
+    using = router.db_for_write(ChapterProgress)
+    features = connections[using].features
+
+    rows = [
+        ChapterProgress(
+            user_id=user_id,
+            chapter_id=chapter_id,
+            course_id=entry["course_id"],
+            position=entry["position"],
+            completed=entry["completed"],
+            updated_at=entry["updated_at"],
+        )
+        for (user_id, chapter_id), entry in pending.items()
+    ]
+
+    with transaction.atomic(using=using):
+        # completion is sticky: rows that do not complete a chapter leave
+        # the stored flag alone, whatever other processes wrote meanwhile
+        for completed in (True, False):
+            ChapterProgress.objects.bulk_create(
+                [row for row in rows if row.completed == completed],
+                batch_size=500,
+                update_conflicts=True,
+                # MySQL upserts on any unique key and takes no target
+                unique_fields=(
+                    ["user", "chapter"]
+                    if features.supports_update_conflicts_with_target else None
+                ),
+                update_fields=(
+                    ["position", "completed", "updated_at"]
+                    if completed else ["position", "updated_at"]
+                ),
+            )
+
+        latest = {}
+        for row in sorted(rows, key=lambda row: row.updated_at):
+            latest[row.user_id, row.course_id] = row
+
+        # counted from the (user, chapter) unique rows, so replaying or
+        # racing flushes cannot count a chapter twice
+        done = ChapterProgress.objects.filter(
+            user_id=OuterRef("user_id"),
+            course_id=OuterRef("course_id"),
+            completed=True,
+        ).values("user_id").annotate(total=Count("pk")).values("total")
+
+        for (user_id, course_id), row in latest.items():
+            Enrollment.objects.filter(user_id=user_id, course_id=course_id).update(
+                completed_chapters=Coalesce(Subquery(done), 0),
+                last_chapter_id=row.chapter_id,
+                last_position=row.position,
+            )
+
+        completed = {(row.user_id, row.course_id) for row in rows if row.completed}
+        if completed:
+            Enrollment.objects.filter(
+                reduce(or_, (
+                    Q(user_id=user_id, course_id=course_id)
+                    for user_id, course_id in completed
+                )),
+                status="active",
+                course__chapter_count__gt=0,
+                completed_chapters__gte=F("course__chapter_count"),
+            ).update(status="completed")
+
+
+def chapters_removed(chapters):
+    """
+    Take ``chapters`` (a queryset, before deletion) out of the completed
+    chapter counts of every enrollment that had completed any of them,
+    then re-evaluate the status of their courses' enrollments against the
+    chapter count each course is left with.
+    """
+    done = ChapterProgress.objects.filter(
+        chapter__in=chapters,
+        completed=True,
+        user_id=OuterRef("user_id"),
+        course_id=OuterRef("course_id"),
+    )
+    removed = done.values("user_id").annotate(total=Count("pk")).values("total")
+
+    Enrollment.objects.filter(Exists(done)).update(
+        completed_chapters=F("completed_chapters") - Subquery(removed)
+    )
+
+    # the course's counters are only lowered once the rows are gone
+    left = Subquery(
+        Course.objects.filter(pk=OuterRef("course_id")).values("chapter_count")
+    ) - Subquery(
+        chapters.filter(section__course_id=OuterRef("course_id"))
+        .order_by().values("section__course_id")
+        .annotate(total=Count("pk")).values("total")
+    )
+    Enrollment.objects.filter(
+        course_id__in=chapters.values("section__course_id")
+    ).alias(
+        left=ExpressionWrapper(left, output_field=IntegerField())
+    ).filter(
+        Q(Exists(done), status="completed", completed_chapters__lt=F("left"))
+        # the course lost the last chapters these learners had left
+        | Q(status="active", left__gt=0, completed_chapters__gte=F("left"))
+    ).update(
+        status=Case(When(status="completed", then=Value("active")), default=Value("completed"))
+    )
+
+
+class ProgressBuffer:
+    """
+    Process-local buffer of learner heartbeats. Repeated heartbeats for
+    the same chapter collapse into one pending entry, and entries are
+    written together by ``write_progress`` once enough are pending or the
+    oldest is old enough. A timer started with the first pending entry
+    covers processes that stop receiving heartbeats.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record(self, user_id, course_id, chapter_id, position, completed=False):
+        options = get_options()
+
+        with self._lock:
+            previous = self._pending.get((user_id, chapter_id))
+            self._pending[(user_id, chapter_id)] = {
+                "course_id": course_id,
+                "position": position,
+                "completed": completed or bool(previous and previous["completed"]),
+                "updated_at": timezone.now(),
+            }
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._timer = threading.Timer(options["FLUSH_INTERVAL"], self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+            due = (
+                len(self._pending) >= options["MAX_PENDING"]
+                or time.monotonic() - self._oldest >= options["FLUSH_INTERVAL"]
+            )
+
+        if due:
+            self.flush()
+
+    def pending(self, user_id, course_id):
+        """
+        Copies of the entries still waiting for ``user_id`` in
+        ``course_id``, keyed by chapter id, for reads that must reflect
+        them without writing them.
+        """
+        with self._lock:
+            return {
+                chapter_id: dict(entry)
+                for (pending_user_id, chapter_id), entry in self._pending.items()
+                if pending_user_id == user_id and entry["course_id"] == course_id
+            }
+
+    def flush(self, user_id=None):
+        """
+        Write the pending entries, or only ``user_id``'s, so that reading
+        one learner's progress does not write everybody else's.
+        """
+        with self._lock:
+            if user_id is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {
+                    key: entry for key, entry in self._pending.items()
+                    if key[0] == user_id
+                }
+                for key in pending:
+                    del self._pending[key]
+
+            timer = None
+            if not self._pending:
+                self._oldest = None
+                timer, self._timer = self._timer, None
+
+        if timer is not None:
+            timer.cancel()
+        if pending:
+            write_progress(pending)
+        return len(pending)
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing buffered progress failed")
+        finally:
+            connections.close_all()
+
+
+buffer = ProgressBuffer()
+atexit.register(buffer.flush)
@@ -0,0 +1,65 @@
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from courses.ordering import GAP, apply_sort_keys
+
+
+def parse_id(value, field):
+    """``value`` from the request as an integer id, or a 400 naming ``field``."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({field: "Expected an integer id"})
+
+
+def validate_permutation(items, current_ids):
+    """
+    Check that ``items`` ([{"id": .., "order": ..}, ...]) assigns every one
+    of ``current_ids`` exactly one position in 1..n, and return {id: order}.
+    """
+    if not isinstance(items, list):
+        raise ValidationError("Expected a list of {id, order} items")
+
+    mapping = {}
+    for item in items:
+        try:
+            pk, order = int(item["id"]), int(item["order"])
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError("Each item needs an integer id and order")
+
+        if pk in mapping:
+            raise ValidationError(f"Duplicate id {pk}")
+        mapping[pk] = order
+
+    current_ids = set(current_ids)
+    unknown = mapping.keys() - current_ids
+    missing = current_ids - mapping.keys()
+
+    if unknown:
+        raise ValidationError(f"Unknown ids: {sorted(unknown)}")
+    if missing:
+        raise ValidationError(f"Missing ids: {sorted(missing)}")
+
+    if sorted(mapping.values()) != list(range(1, len(mapping) + 1)):
+        raise ValidationError("Orders must be unique and run from 1 to n")
+
+    return mapping
+
+
+def reorder(queryset, items):
+    """
+    Validate and apply a complete reordering of the siblings in
+    ``queryset`` and return the canonical [{"id", "order"}] list.
+    """
+    with transaction.atomic():
+        current_ids = queryset.select_for_update().values_list("pk", flat=True)
+        mapping = validate_permutation(items, list(current_ids))
+        # evenly spaced keys, which also renormalizes the siblings
+        apply_sort_keys(
+            queryset, {pk: order * GAP for pk, order in mapping.items()}
+        )
+
+    return [
+        {"id": pk, "order": order}
+        for pk, order in sorted(mapping.items(), key=lambda item: item[1])
+    ]
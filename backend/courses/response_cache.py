@@ -0,0 +1,166 @@
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from courses.utils import on_commit_once
+
+DEFAULTS = {
+    # alias from CACHES; locmem by default, a shared backend in production
+    "CACHE": "default",
+    "TIMEOUT": 600,
+}
+
+CATALOG_KEY = "courses:catalog:generation"
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "RESPONSE_CACHE", {})}
+
+
+def get_cache():
+    return caches[get_options()["CACHE"]]
+
+
+def _new_version():
+    return uuid.uuid4().hex[:16]
+
+
+def _current(key):
+    # a version that was evicted is simply replaced by a fresh one, which
+    # can only cause misses, never a stale hit
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+async def _acurrent(key):
+    cache = get_cache()
+    version = await cache.aget(key)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key) or version
+    return version
+
+
+def course_version_key(course_id):
+    return f"courses:version:{course_id}"
+
+
+def course_version(course_id):
+    return _current(course_version_key(course_id))
+
+
+async def acourse_version(course_id):
+    return await _acurrent(course_version_key(course_id))
+
+
+def catalog_generation():
+    return _current(CATALOG_KEY)
+
+
+async def acatalog_generation():
+    return await _acurrent(CATALOG_KEY)
+
+
+def bump_course(course_id):
+    get_cache().set(course_version_key(course_id), _new_version(), None)
+
+
+def bump_catalog():
+    get_cache().set(CATALOG_KEY, _new_version(), None)
+
+
+def schedule_bump(course_id, catalog=False):
+    on_commit_once(("response_cache", course_id), bump_course, course_id)
+    if catalog:
+        on_commit_once(("response_cache", "catalog"), bump_catalog)
+
+
+def _digest(request, query=""):
+    # responses carry absolute URLs, so every host gets its own copy
+    return hashlib.sha1(f"{request.get_host()}?{query}".encode()).hexdigest()
+
+
+def detail_key(request, course_id, variant="public"):
+    version = course_version(course_id)
+    return f"courses:detail:{course_id}:{variant}:{version}:{_digest(request)}"
+
+
+async def adetail_key(request, course_id, variant="public"):
+    version = await acourse_version(course_id)
+    return f"courses:detail:{course_id}:{variant}:{version}:{_digest(request)}"
+
+
+def _catalog_digest(request):
+    return _digest(request, urlencode(sorted(request.query_params.lists()), doseq=True))
+
+
+def catalog_key(request):
+    return f"courses:catalog:{catalog_generation()}:{_catalog_digest(request)}"
+
+
+async def acatalog_key(request):
+    return f"courses:catalog:{await acatalog_generation()}:{_catalog_digest(request)}"
+
+
+def etag_for(key):
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+def not_modified(request, etag):
+    return etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+
+
+def not_modified_response(etag):
+    response = Response(status=304)
+    response["ETag"] = etag
+    return response
+
+
+def cached_response(request, key, build, cacheable=None):
+    etag = etag_for(key)
+
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+
+    cache = get_cache()
+    data = cache.get(key)
+
+    if data is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+        if cacheable is None or cacheable(response):
+            cache.set(key, response.data, get_options()["TIMEOUT"])
+    else:
+        response = Response(data)
+
+    response["ETag"] = etag
+    return response
+
+
+async def acached_data(key, build, cacheable=None):
+    """
+    The async views' side of cached_response: the data cached under
+    ``key``, or else what the coroutine ``build`` returns, stored when
+    ``cacheable(data)`` allows. Errors are raised by ``build``, and so
+    never cached.
+    """
+    cache = get_cache()
+    data = await cache.aget(key)
+
+    if data is None:
+        data = await build()
+        if cacheable is None or cacheable(data):
+            await cache.aset(key, data, get_options()["TIMEOUT"])
+    return data
@@ -0,0 +1,265 @@
+import re
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from courses.utils import on_commit_once
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def build_document(course, apps=global_apps):
+    Section = apps.get_model("courses", "Section")
+    Chapter = apps.get_model("courses", "Chapter")
+
+    parts = [course.description, course.requirements]
+    parts.extend(
+        Section.objects.filter(course=course).values_list("title", flat=True)
+    )
+    parts.extend(
+        Chapter.objects.filter(section__course=course).values_list("title", flat=True)
+    )
+    return {"title": course.title, "body": "\n".join(p for p in parts if p)}
+
+
+def reindex_course(course_id):
+    Course = global_apps.get_model("courses", "Course")
+    CourseSearchDocument = global_apps.get_model("courses", "CourseSearchDocument")
+
+    course = Course.objects.filter(pk=course_id, is_published=True).first()
+
+    if course is None:
+        CourseSearchDocument.objects.filter(course_id=course_id).delete()
+        get_search_backend().remove(course_id)
+        return
+
+    document, _ = CourseSearchDocument.objects.update_or_create(
+        course=course,
+        defaults=build_document(course),
+    )
+    get_search_backend().index(document)
+
+
+def schedule_reindex(course_id):
+    on_commit_once(("search", course_id), reindex_course, course_id)
+
+
+def rebuild_documents(apps=global_apps):
+    Course = apps.get_model("courses", "Course")
+    CourseSearchDocument = apps.get_model("courses", "CourseSearchDocument")
+
+    CourseSearchDocument.objects.all().delete()
+    documents = [
+        CourseSearchDocument(course=course, **build_document(course, apps))
+        for course in Course.objects.filter(is_published=True).iterator()
+    ]
+    CourseSearchDocument.objects.bulk_create(documents, batch_size=500)
+    return len(documents)
+
+
+def apply_hits(queryset, hits):
+    if not hits:
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.filter(pk__in=[course_id for course_id, _ in hits]).annotate(
+        search_rank=Case(
+            *[When(pk=course_id, then=Value(score)) for course_id, score in hits],
+            output_field=FloatField(),
+        )
+    )
+
+
+class SearchBackend(ABC):
+    # backends that read CourseSearchDocument directly keep no index of
+    # their own, and need not override index, remove and reset
+    def index(self, document):
+        pass
+
+    def remove(self, course_id):
+        pass
+
+    def reset(self):
+        pass
+
+    @abstractmethod
+    def search(self, query, limit):
+        """[(course_id, score), ...] for ``query``, best first, at most ``limit``."""
+
+
+class MySQLFullTextBackend(SearchBackend):
+    match = "MATCH (title, body) AGAINST (%s IN BOOLEAN MODE)"
+    # InnoDB's innodb_ft_min_token_size and default stopword list; a
+    # required term that the index never stores would match nothing
+    min_token_size = 3
+    stopwords = frozenset({
+        "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en",
+        "for", "from", "how", "i", "in", "is", "it", "la", "of", "on", "or",
+        "that", "the", "this", "to", "was", "what", "when", "where", "who",
+        "will", "with", "und", "www",
+    })
+
+    def boolean_query(self, query):
+        terms = [
+            term for term in tokenize(query)
+            if len(term) >= self.min_token_size and term not in self.stopwords
+        ]
+        # every term required, each matched as a prefix for search-as-you-type
+        return " ".join(f"+{term}*" for term in terms)
+
+    def search(self, query, limit):
+        CourseSearchDocument = global_apps.get_model("courses", "CourseSearchDocument")
+
+        expression = self.boolean_query(query)
+        if not expression:
+            return []
+
+        return list(
+            CourseSearchDocument.objects.filter(
+                RawSQL(self.match, [expression], output_field=BooleanField())
+            ).annotate(
+                score=RawSQL(self.match, [expression], output_field=FloatField())
+            ).order_by("-score", "-course_id").values_list(
+                "course_id", "score"
+            )[:limit]
+        )
+
+
+class InvertedIndexBackend(SearchBackend):
+    """
+    In-process inverted index over CourseSearchDocument, for databases
+    without a full-text index (SQLite in tests and local development).
+    Every change bumps a generation in the cache, and each process loads
+    the index again on its next search after the generation moved.
+    """
+    generation_key = "courses:search:generation"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._terms = []
+        self._generation = None
+
+    def _cache(self):
+        return caches[getattr(settings, "COURSE_SEARCH_CACHE", "default")]
+
+    def _current_generation(self):
+        cache = self._cache()
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            generation = uuid.uuid4().hex[:16]
+            if not cache.add(self.generation_key, generation, None):
+                generation = cache.get(self.generation_key) or generation
+        return generation
+
+    def reset(self):
+        self._cache().set(self.generation_key, uuid.uuid4().hex[:16], None)
+
+    def _load(self, generation):
+        CourseSearchDocument = global_apps.get_model("courses", "CourseSearchDocument")
+
+        self._postings = defaultdict(dict)
+        for document in CourseSearchDocument.objects.iterator():
+            self._add(document)
+        self._terms = sorted(self._postings)
+        self._generation = generation
+
+    def _add(self, document):
+        weights = defaultdict(float)
+        for token in tokenize(document.title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(document.body):
+            weights[token] += BODY_WEIGHT
+
+        for token, weight in weights.items():
+            self._postings[token][document.course_id] = weight
+
+    def index(self, document):
+        self.reset()
+
+    def remove(self, course_id):
+        self.reset()
+
+    def _match(self, term):
+        scores = defaultdict(float)
+        start = bisect_left(self._terms, term)
+
+        for token in self._terms[start:]:
+            if not token.startswith(term):
+                break
+            # exact matches outrank prefix completions
+            boost = 1.0 if token == term else 0.5
+            for course_id, weight in self._postings[token].items():
+                scores[course_id] += weight * boost
+
+        return scores
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # read before loading, so a change during the load is seen next time
+        generation = self._current_generation()
+        with self._lock:
+            if generation != self._generation:
+                self._load(generation)
+
+            scores = None
+            for term in terms:
+                matches = self._match(term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {
+                        course_id: score + matches[course_id]
+                        for course_id, score in scores.items()
+                        if course_id in matches
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda hit: (-hit[1], -hit[0]))
+        return ranked[:limit]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, "COURSE_SEARCH_BACKEND", None)
+                if path:
+                    _backend = import_string(path)()
+                elif connection.vendor == "mysql":
+                    _backend = MySQLFullTextBackend()
+                else:
+                    _backend = InvertedIndexBackend()
+    return _backend
+
+
+def search_courses(queryset, query):
+    limit = getattr(settings, "COURSE_SEARCH_MAX_RESULTS", 500)
+    return apply_hits(queryset, get_search_backend().search(query, limit))
@@ -1,41 +1,47 @@
+from django.conf import settings
 from rest_framework import serializers
+
+from backend.metrics import TimedSerializerMixin
 from .models import Course, Section, Chapter, Enrollment
-from django.db.models import Sum
+from .authoring import create_course_tree
+from .thumbnails import srcsets
+from .tree import attach_section_chapters
+
+class ChapterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # dense position among the section's chapters, see PositionedModel
+    order = serializers.IntegerField(min_value=1, required=False)
 
-class ChapterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chapter
         fields = ["id", "title", "video_url", "video_duration", "order"]
 
-    def get_video_url(self, obj):
-        request = self.context.get("request")
-        user = request.user if request else None
-    
-        if not user or not user.is_authenticated:
-            return None
-
-        if obj.section.course.enrollments.filter(user=user).exists():
-            return obj.video_url
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
 
-        if obj.section.course.creator == user:
-            return obj.video_url
+        # views put the per-course access decision in the context
+        if not self.context.get("video_access"):
+            data["video_url"] = None
 
-        
-        return None
+        return data
 
 
-class SectionSerializer(serializers.ModelSerializer):
+class SectionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     chapters = ChapterSerializer(many=True, read_only=True)
+    order = serializers.IntegerField(min_value=1, required=False)
 
     class Meta:
         model = Section
         fields = ["id", "title", "order", "chapters"]
 
+    def to_representation(self, obj):
+        # sections outside a course tree (create/update responses) would
+        # otherwise count their way to every chapter's position
+        if "chapters" not in getattr(obj, "_prefetched_objects_cache", {}):
+            attach_section_chapters(obj)
+        return super().to_representation(obj)
 
-class CourseSerializer(serializers.ModelSerializer):
 
-    
-    total_hours = serializers.SerializerMethodField()
+class CourseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Course
@@ -50,18 +56,8 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ["total_hours"]
 
 
-    def get_total_hours(self, obj):
-        total_hours = Chapter.objects.filter(
-            section__course=obj
-        ).aggregate(
-            total = Sum("video_duration")
-        )["total"] or 0
-        return total_hours    
-
-
-class CourseDetailSerializer(serializers.ModelSerializer):
+class CourseDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     sections = SectionSerializer(many=True, read_only=True)
-    total_hours = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
@@ -76,31 +72,67 @@ class CourseDetailSerializer(serializers.ModelSerializer):
             "is_published",
         ]
 
-    def get_total_hours(self, obj):
-        total_hours = Chapter.objects.filter(
-            section__course=obj
-        ).aggregate(
-            total = Sum("video_duration")
-        )["total"] or 0
-        return total_hours
+class ChapterImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Chapter
+        fields = ["title", "video_url", "video_duration"]
+
+    def validate_video_duration(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Duration cannot be negative")
+        return value
+
+
+class SectionImportSerializer(serializers.ModelSerializer):
+    chapters = ChapterImportSerializer(many=True, required=False)
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Section
+        fields = ["title", "chapters"]
+
+
+class CourseImportSerializer(serializers.ModelSerializer):
+    sections = SectionImportSerializer(many=True, required=False)
+
+    class Meta:
+        model = Course
+        fields = ["title", "description", "requirements", "sections"]
+
+    def validate_sections(self, sections):
+        total = sum(len(section.get("chapters", [])) for section in sections)
+
+        if total > settings.COURSE_IMPORT_MAX_CHAPTERS:
+            raise serializers.ValidationError(
+                f"A course can be imported with at most "
+                f"{settings.COURSE_IMPORT_MAX_CHAPTERS} chapters"
+            )
+        return sections
+
+    def create(self, validated_data):
+        return create_course_tree(validated_data.pop("creator"), validated_data)
+
+
+class ProgressHeartbeatSerializer(serializers.Serializer):
+    chapter = serializers.IntegerField()
+    position = serializers.FloatField(min_value=0)
+    completed = serializers.BooleanField(default=False)
+
+
+class EnrollmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = ["id", "user", "course", "status"]
         read_only_fields = ["user"]
 
 
-class CourseListSerializer(serializers.ModelSerializer):
+class CourseListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     creator_name = serializers.CharField(source="creator.user_name", read_only=True)
-    
-    total_hours = serializers.SerializerMethodField()
 
     
     creator_id = serializers.IntegerField(
-        source="creator.id",
         read_only=True
     )
+    thumbnails = serializers.SerializerMethodField()
 
 
     class Meta:
@@ -112,12 +144,10 @@ class CourseListSerializer(serializers.ModelSerializer):
             "total_hours",
             "creator_name",
             "creator_id",
+            "thumbnails",
         ]
 
-    def get_total_hours(self, obj):
-        total_hours = Chapter.objects.filter(
-            section__course=obj
-        ).aggregate(
-            total = Sum("video_duration")
-        )["total"] or 0
-        return total_hours
+    def get_thumbnails(self, obj):
+        request = self.context.get("request")
+        build_url = request.build_absolute_uri if request else str
+        return srcsets(obj, build_url)
@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from courses import counters, progress, response_cache, thumbnails
+from courses.models import Chapter, Course, Enrollment, Section
+from courses.search import schedule_reindex
+
+User = get_user_model()
+
+
+def _deleted_with(kwargs, *models):
+    """
+    Whether the delete that sent this signal started at one of ``models``,
+    from an instance or from a queryset (the admin's bulk delete), and so
+    takes the signalled row away together with it.
+    """
+    origin = kwargs.get("origin")
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+@receiver(post_delete, sender=Chapter)
+def update_counters_on_chapter_delete(sender, instance, **kwargs):
+    # chapters removed with their section are accounted for once, below;
+    # an instructor's courses go away whole
+    if _deleted_with(kwargs, User, Course, Section):
+        return
+    counters.chapter_deleted(instance)
+
+
+@receiver(pre_delete, sender=Section)
+def remember_section_totals(sender, instance, **kwargs):
+    if _deleted_with(kwargs, User, Course):
+        return
+    instance._deleted_totals = counters.section_totals(instance)
+
+
+@receiver(post_delete, sender=Section)
+def update_counters_on_section_delete(sender, instance, **kwargs):
+    if _deleted_with(kwargs, User, Course):
+        return
+    counters.section_deleted(instance, instance._deleted_totals)
+
+
+@receiver(pre_delete, sender=Chapter)
+def forget_completed_chapter(sender, instance, **kwargs):
+    # enrollments go away together with their course
+    if _deleted_with(kwargs, User, Course, Section):
+        return
+    progress.chapters_removed(Chapter.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=Section)
+def forget_completed_section(sender, instance, **kwargs):
+    if _deleted_with(kwargs, User, Course):
+        return
+    progress.chapters_removed(Chapter.objects.filter(section=instance))
+
+
+@receiver(post_save, sender=Enrollment)
+def count_created_enrollment(sender, instance, created, **kwargs):
+    if created:
+        counters.enrollment_added(
+            instance.course_id, instance.user_id, instance.enrolled_on
+        )
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_deleted_enrollment(sender, instance, **kwargs):
+    # enrollments removed with their course go away with the counter, and
+    # a deleted user's are recounted at once below
+    if _deleted_with(kwargs, User, Course):
+        return
+    counters.enrollment_removed(
+        instance.course_id, instance.user_id, instance.enrolled_on
+    )
+
+
+@receiver(pre_delete, sender=User)
+def remember_enrolled_courses(sender, instance, **kwargs):
+    # the user's own courses, and their enrollments, are deleted with them
+    instance._enrolled_course_ids = list(
+        Enrollment.objects.filter(user=instance)
+        .exclude(course__creator=instance)
+        .values_list("course_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def recount_enrolled_courses(sender, instance, **kwargs):
+    course_ids = getattr(instance, "_enrolled_course_ids", None)
+    if not course_ids:
+        return
+
+    courses = Course.objects.filter(pk__in=course_ids)
+    counters.rebuild_enrollment_counts(courses)
+    counters.rebuild_enrollment_rollups(courses)
+    counters.rebuild_instructor_stats(
+        set(courses.values_list("creator_id", flat=True))
+    )
+
+
+@receiver(post_save, sender=Course)
+def update_instructor_courses(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_tracked_published", None)
+    if created or previous != instance.is_published:
+        counters.refresh_instructor_courses(instance.creator_id)
+
+
+@receiver(post_save, sender=Course)
+def generate_thumbnails(sender, instance, **kwargs):
+    if getattr(instance, "_thumbnail_changed", False) and instance.thumbnail:
+        thumbnails.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def rebuild_instructor_stats_on_course_delete(sender, instance, **kwargs):
+    # the stats row goes away with an instructor being deleted
+    if _deleted_with(kwargs, User):
+        return
+    counters.rebuild_instructor_stats([instance.creator_id])
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    schedule_reindex(instance.pk)
+    # the catalog only lists published courses: edits to those, and
+    # publishing or unpublishing, change it
+    listed = instance.is_published or getattr(instance, "_tracked_published", False)
+    response_cache.schedule_bump(instance.pk, catalog=bool(listed))
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def section_changed(sender, instance, **kwargs):
+    # sections removed with their course are handled by the course delete
+    if _deleted_with(kwargs, User, Course):
+        return
+    course = instance.course
+    schedule_reindex(course.pk)
+    response_cache.schedule_bump(course.pk, catalog=course.is_published)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def chapter_changed(sender, instance, **kwargs):
+    if _deleted_with(kwargs, User, Course, Section):
+        return
+    course = instance.section.course
+    schedule_reindex(course.pk)
+    response_cache.schedule_bump(course.pk, catalog=course.is_published)
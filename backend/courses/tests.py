@@ -1,3 +1,1138 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import tempfile
+import threading
+from datetime import date, datetime
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import isolate_apps
+from django.utils import timezone
+from PIL import Image, features
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from accounts.cache import permission_cache
+from accounts.models import User
+from accounts.tokens import PermissionRefreshToken
+from backend.query_budget import QueryBudgetTestMixin
+from courses import async_urls, counters, enrollment, progress, thumbnails, urls
+from courses.analytics import enrollment_series, parse_range
+from courses.enrollment import BulkEnrollError, bulk_enroll, iter_emails
+from courses.models import (
+    Chapter,
+    ChapterProgress,
+    Course,
+    CourseSearchDocument,
+    Enrollment,
+    EnrollmentRollup,
+    InstructorStats,
+    Section,
+)
+from courses.ordering import GAP, PositionedModel
+from courses.reorder import reorder
+from courses.search import (
+    InvertedIndexBackend,
+    MySQLFullTextBackend,
+    get_search_backend,
+    rebuild_documents,
+)
+
+
+class EndpointBudgetTests(QueryBudgetTestMixin):
+    """
+    Runs every courses endpoint against its query budget. Subclasses set
+    ``course_count``; the budgets must hold for any catalog size.
+    """
+
+    course_count = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("setup_roles", verbosity=0, stdout=io.StringIO())
+
+        cls.instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.instructor.groups.add(Group.objects.get(name="Instructor"))
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw"
+        )
+        cls.student.groups.add(Group.objects.get(name="Student"))
+        cls.newcomer = User.objects.create_user(
+            email="newcomer@example.com", user_name="newcomer", password="pw"
+        )
+        cls.newcomer.groups.add(Group.objects.get(name="Student"))
+        cls.admin = User.objects.create_user(
+            email="admin@example.com", user_name="admin", password="pw", is_staff=True
+        )
+
+        cls.course = Course.objects.create(
+            creator=cls.instructor, title="Python", description="Basics", is_published=True
+        )
+        cls.sections = [
+            Section.objects.create(course=cls.course, title=f"Part {i}") for i in range(2)
+        ]
+        cls.chapters = [
+            Chapter.objects.create(
+                section=section,
+                title=f"Lesson {i}",
+                video_url="https://example.com/video",
+                video_duration=0.5,
+            )
+            for section in cls.sections
+            for i in range(3)
+        ]
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+
+        others = Course.objects.bulk_create(
+            Course(creator=cls.instructor, title=f"Course {i}", description="", is_published=True)
+            for i in range(cls.course_count - 1)
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(user=cls.student, course=course) for course in others
+        )
+        counters.rebuild_enrollment_counts()
+        counters.rebuild_instructor_stats()
+        # reindexing waits for a commit that never comes in a TestCase
+        rebuild_documents()
+
+    def setUp(self):
+        caches["default"].clear()
+        permission_cache.invalidate_all()
+        # write heartbeats inside the test's transaction, not from the timer
+        self.addCleanup(progress.buffer.flush)
+        # every search starts from a cold in-process index
+        get_search_backend().reset()
+
+    def bearer(self, user):
+        return f"Bearer {PermissionRefreshToken.for_user(user).access_token}"
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=self.bearer(user))
+
+    def assertMatchesAsync(self, path, user=None):
+        """
+        Requests ``path`` from the sync view, then from its async version in
+        backend.asgi_urls, which must stay within budget and answer the same.
+        """
+        if user is None:
+            self.client.credentials()
+        else:
+            self.authenticate(user)
+        expected = self.client.get(path)
+        caches["default"].clear()
+
+        headers = {} if user is None else {"Authorization": self.bearer(user)}
+        with override_settings(ROOT_URLCONF="backend.asgi_urls"):
+            response = self.assertAsyncWithinBudget("get", path, headers=headers)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+
+    def test_all_views_budgeted(self):
+        self.assertAllViewsBudgeted(urls.urlpatterns)
+        self.assertAllViewsBudgeted(async_urls.urlpatterns)
+
+    def test_catalog(self):
+        self.assertWithinBudget("get", "/api/courses/")
+        response = self.assertWithinBudget("get", "/api/courses/?search=python")
+        self.assertEqual(
+            [course["id"] for course in response.data["results"]], [self.course.pk]
+        )
+
+    def test_course_detail(self):
+        self.assertWithinBudget("get", f"/api/courses/{self.course.pk}/")
+        self.authenticate(self.student)
+        self.assertWithinBudget("get", f"/api/courses/{self.course.pk}/")
+
+    def test_my_courses(self):
+        self.authenticate(self.instructor)
+        self.assertWithinBudget("get", "/api/courses/my-courses/")
+
+    def test_my_enrollments(self):
+        self.authenticate(self.student)
+        self.assertWithinBudget("get", "/api/courses/my-enrollments/")
+
+    def test_create_course(self):
+        self.authenticate(self.instructor)
+        response = self.assertWithinBudget(
+            "post", "/api/courses/create/", data={"title": "New", "description": "d"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_import_course(self):
+        self.authenticate(self.instructor)
+        payload = {
+            "title": "Imported",
+            "description": "d",
+            "sections": [
+                {
+                    "title": f"Part {i}",
+                    "chapters": [
+                        {"title": f"Lesson {j}", "video_url": "https://example.com/v", "video_duration": 1}
+                        for j in range(20)
+                    ],
+                }
+                for i in range(5)
+            ],
+        }
+        response = self.assertWithinBudget(
+            "post", "/api/courses/import/", data=payload, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_update_course(self):
+        self.authenticate(self.instructor)
+        response = self.assertWithinBudget(
+            "patch",
+            f"/api/courses/{self.course.pk}/update/",
+            data={"title": "Python 2"},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_learn(self):
+        self.authenticate(self.student)
+        self.assertWithinBudget("get", f"/api/courses/learn/{self.course.pk}/")
+        self.authenticate(self.instructor)
+        self.assertWithinBudget("get", f"/api/courses/learn/{self.course.pk}/")
+
+    def test_async_read_endpoints(self):
+        self.assertMatchesAsync("/api/courses/")
+        self.assertMatchesAsync("/api/courses/?search=python")
+        self.assertMatchesAsync("/api/courses/?page_size=1", self.student)
+        self.assertMatchesAsync(f"/api/courses/{self.course.pk}/")
+        self.assertMatchesAsync(f"/api/courses/{self.course.pk}/", self.student)
+        self.assertMatchesAsync("/api/courses/my-enrollments/", self.student)
+        self.assertMatchesAsync("/api/courses/my-enrollments/")
+        self.assertMatchesAsync(f"/api/courses/learn/{self.course.pk}/", self.student)
+        self.assertMatchesAsync(f"/api/courses/learn/{self.course.pk}/", self.instructor)
+        self.assertMatchesAsync(f"/api/courses/learn/{self.course.pk}/", self.newcomer)
+        self.assertMatchesAsync("/api/courses/learn/0/", self.student)
+
+    def test_progress_and_resume(self):
+        self.authenticate(self.student)
+        path = f"/api/courses/learn/{self.course.pk}/progress/"
+        response = self.assertWithinBudget(
+            "post", path, data={"chapter": self.chapters[0].pk, "position": 12}, format="json"
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertWithinBudget("get", path)
+        self.assertWithinBudget("get", f"/api/courses/learn/{self.course.pk}/resume/")
+
+    def test_sections(self):
+        self.authenticate(self.instructor)
+        response = self.assertWithinBudget(
+            "post", "/api/courses/section/create/", data={"course": self.course.pk, "title": "Extra", "order": 1}
+        )
+        section_id = response.data["id"]
+        # the response lists the section's chapters with their positions
+        response = self.assertWithinBudget(
+            "patch", f"/api/courses/section/{self.sections[0].pk}/update/", data={"title": "Renamed"}
+        )
+        self.assertEqual([chapter["order"] for chapter in response.data["chapters"]], [1, 2, 3])
+        self.assertWithinBudget(
+            "patch",
+            "/api/courses/section/reorder/",
+            data={
+                "course_id": self.course.pk,
+                "sections": [
+                    {"id": pk, "order": i}
+                    for i, pk in enumerate([section_id] + [s.pk for s in self.sections], start=1)
+                ],
+            },
+            format="json",
+        )
+        # deleting a section with chapters must not cost a query per chapter
+        self.assertWithinBudget("delete", f"/api/courses/section/{self.sections[1].pk}/delete/")
+        self.assertEqual(
+            Course.objects.get(pk=self.course.pk).chapter_count, 3
+        )
+
+    def test_chapters(self):
+        self.authenticate(self.instructor)
+        section = self.sections[0]
+        response = self.assertWithinBudget(
+            "post",
+            "/api/courses/chapter/create/",
+            data={
+                "section": section.pk,
+                "title": "Extra",
+                "video_url": "https://example.com/v",
+                "video_duration": 1,
+            },
+        )
+        chapter_id = response.data["id"]
+        self.assertWithinBudget(
+            "patch", f"/api/courses/chapter/{chapter_id}/update/", data={"video_duration": 2}
+        )
+        ids = list(section.chapters.values_list("pk", flat=True))
+        self.assertWithinBudget(
+            "patch",
+            "/api/courses/chapter/reorder/",
+            data={
+                "section_id": section.pk,
+                "chapters": [{"id": pk, "order": i} for i, pk in enumerate(reversed(ids), start=1)],
+            },
+            format="json",
+        )
+        self.assertWithinBudget("delete", f"/api/courses/chapter/{chapter_id}/delete/")
+
+    def test_enroll(self):
+        self.authenticate(self.newcomer)
+        response = self.assertWithinBudget("post", f"/api/courses/{self.course.pk}/enroll/")
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinBudget("post", f"/api/courses/{self.course.pk}/enroll/")
+
+    def test_bulk_enroll(self):
+        self.authenticate(self.admin)
+        upload = SimpleUploadedFile(
+            "cohort.csv", b"email\nnewcomer@example.com\nstudent@example.com\nnobody@example.com\n"
+        )
+        response = self.assertWithinBudget(
+            "post", f"/api/courses/{self.course.pk}/bulk-enroll/", data={"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.data, {"created": 1, "skipped": 1, "unknown": 1})
+
+    def test_toggle_publish(self):
+        self.authenticate(self.instructor)
+        # unpublishing and publishing again touch the search index differently
+        self.assertWithinBudget("patch", f"/api/courses/{self.course.pk}/toggle-publish/")
+        self.assertWithinBudget("patch", f"/api/courses/{self.course.pk}/toggle-publish/")
+
+    def test_thumbnail(self):
+        response = self.assertWithinBudget("get", f"/api/courses/{self.course.pk}/thumbnail/320.jpg")
+        self.assertEqual(response.status_code, 404)
+
+    def test_instructor_views(self):
+        self.authenticate(self.instructor)
+        self.assertWithinBudget("get", "/api/courses/instructor/dashboard/")
+        self.assertWithinBudget("get", "/api/courses/instructor/analytics/")
+        self.assertWithinBudget("get", f"/api/courses/instructor/course/{self.course.pk}/")
+
+
+class SingleCourseBudgetTests(EndpointBudgetTests, APITestCase):
+    course_count = 1
+
+
+class LargeCatalogBudgetTests(EndpointBudgetTests, APITestCase):
+    course_count = 1000
+
+
+class BulkEnrollTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.course = Course.objects.create(
+            creator=cls.instructor, title="Python", description="", is_published=True
+        )
+        cls.students = [
+            User.objects.create_user(email=f"s{i}@example.com", user_name=f"s{i}", password="pw")
+            for i in range(5)
+        ]
+
+    def test_parse_error_keeps_earlier_chunks_counted(self):
+        lines = [json.dumps({"email": user.email}) for user in self.students] + ["{broken"]
+
+        with self.assertRaises(BulkEnrollError) as raised:
+            bulk_enroll(self.course, iter_emails(lines, "jsonl"), chunk_size=2)
+
+        # the chunk holding the bad line never reached the database
+        self.assertEqual(raised.exception.result, {"created": 4, "skipped": 0, "unknown": 0})
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 4)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrollment_count, 4)
+        stats = InstructorStats.objects.get(instructor=self.instructor)
+        self.assertEqual((stats.total_enrollments, stats.total_students), (4, 4))
+        self.assertEqual(
+            EnrollmentRollup.objects.filter(course=self.course).aggregate(total=Sum("enrollments")),
+            {"total": 4},
+        )
+
+    def test_counts_only_rows_written(self):
+        insert = enrollment.insert_enrollments
+
+        def racing_insert(enrollments):
+            # another request enrolls one of the students in the meantime
+            Enrollment.objects.bulk_create([Enrollment(user=self.students[0], course=self.course)])
+            return insert(enrollments)
+
+        with mock.patch("courses.enrollment.insert_enrollments", racing_insert):
+            result = bulk_enroll(self.course, [user.email for user in self.students])
+
+        self.assertEqual(result, {"created": 4, "skipped": 1, "unknown": 0})
+        self.assertEqual(
+            EnrollmentRollup.objects.filter(course=self.course).aggregate(total=Sum("enrollments")),
+            {"total": 4},
+        )
+
+    def test_demoted_staff_rejected(self):
+        admin = User.objects.create_user(
+            email="admin@example.com", user_name="admin", password="pw", is_staff=True
+        )
+        token = PermissionRefreshToken.for_user(admin).access_token
+        admin.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.save()
+
+        response = self.client.post(
+            f"/api/courses/{self.course.pk}/bulk-enroll/",
+            {"file": SimpleUploadedFile("cohort.csv", b"email\ns0@example.com\n")},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Enrollment.objects.exists())
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.other_instructor = User.objects.create_user(
+            email="other@example.com", user_name="other", password="pw"
+        )
+        cls.students = [
+            User.objects.create_user(email=f"s{i}@example.com", user_name=f"s{i}", password="pw")
+            for i in range(3)
+        ]
+
+    def create_course(self, creator, sections=2, chapters=3):
+        course = Course.objects.create(
+            creator=creator, title="Course", description="", is_published=True
+        )
+        for i in range(sections):
+            section = Section.objects.create(course=course, title=f"Part {i}")
+            for j in range(chapters):
+                Chapter.objects.create(
+                    section=section,
+                    title=f"Lesson {j}",
+                    video_url="https://example.com/v",
+                    video_duration=0.5,
+                )
+        return course
+
+    def test_delete_instructor_with_enrolled_students(self):
+        course = self.create_course(self.instructor)
+        other = self.create_course(self.other_instructor)
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=course)
+            Enrollment.objects.create(user=student, course=other)
+
+        self.instructor.delete()
+
+        self.assertFalse(Course.objects.filter(pk=course.pk).exists())
+        self.assertFalse(EnrollmentRollup.objects.filter(course_id=course.pk).exists())
+        other.refresh_from_db()
+        self.assertEqual(other.enrollment_count, 3)
+
+    def test_queryset_user_delete(self):
+        course = self.create_course(self.instructor)
+        other = self.create_course(self.other_instructor)
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=course)
+        Enrollment.objects.create(user=self.students[0], course=other)
+
+        User.objects.filter(pk__in=[self.instructor.pk, self.students[0].pk]).delete()
+
+        self.assertFalse(InstructorStats.objects.filter(instructor_id=self.instructor.pk).exists())
+        other.refresh_from_db()
+        self.assertEqual(other.enrollment_count, 0)
+        stats = InstructorStats.objects.get(instructor=self.other_instructor)
+        self.assertEqual((stats.total_enrollments, stats.total_students), (0, 0))
+
+    def test_delete_student(self):
+        course = self.create_course(self.instructor)
+        other = self.create_course(self.instructor)
+        for student in self.students:
+            Enrollment.objects.create(user=student, course=course)
+        Enrollment.objects.create(user=self.students[0], course=other)
+
+        self.students[0].delete()
+
+        course.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((course.enrollment_count, other.enrollment_count), (2, 0))
+        stats = InstructorStats.objects.get(instructor=self.instructor)
+        self.assertEqual((stats.total_enrollments, stats.total_students), (2, 2))
+        self.assertEqual(
+            EnrollmentRollup.objects.filter(course__in=[course, other]).aggregate(total=Sum("enrollments")),
+            {"total": 2},
+        )
+
+    def test_chapter_changes(self):
+        course = self.create_course(self.instructor)
+        first, second = course.sections.all()
+        chapter = first.chapters.first()
+
+        chapter.video_duration = 2
+        chapter.save()
+        chapter.section = second
+        chapter.save()
+        second.chapters.exclude(pk=chapter.pk).first().delete()
+
+        course.refresh_from_db()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.chapter_count, first.total_hours), (2, 1.0))
+        self.assertEqual((second.chapter_count, second.total_hours), (3, 3.0))
+        self.assertEqual((course.chapter_count, course.total_hours), (5, 4.0))
+
+        first.delete()
+        course.refresh_from_db()
+        self.assertEqual((course.chapter_count, course.total_hours), (3, 3.0))
+
+    def test_delete_stale_section(self):
+        course = self.create_course(self.instructor)
+        section = course.sections.first()
+        # counters moved on since the section was loaded
+        Chapter.objects.create(
+            section=section, title="Extra", video_url="https://example.com/v", video_duration=2
+        )
+        section.chapters.first().delete()
+
+        section.delete()
+
+        course.refresh_from_db()
+        self.assertEqual((course.chapter_count, course.total_hours), (3, 1.5))
+
+    def test_queryset_section_delete(self):
+        course = self.create_course(self.instructor, chapters=2)
+        first = course.sections.first()
+        Enrollment.objects.create(user=self.students[0], course=course)
+        for chapter in first.chapters.all():
+            progress.buffer.record(self.students[0].pk, course.pk, chapter.pk, 10, completed=True)
+        progress.buffer.flush()
+
+        # as the admin's bulk delete does
+        Section.objects.filter(pk=first.pk).delete()
+
+        course.refresh_from_db()
+        self.assertEqual((course.chapter_count, course.total_hours), (2, 1.0))
+        enrolled = Enrollment.objects.get(user=self.students[0], course=course)
+        self.assertEqual(enrolled.completed_chapters, 0)
+
+    def test_enroll_is_idempotent(self):
+        course = self.create_course(self.instructor)
+
+        self.assertEqual(enrollment.enroll(self.students[0].pk, course.pk), (True, 1))
+        self.assertEqual(enrollment.enroll(self.students[0].pk, course.pk), (False, 1))
+        self.assertEqual(enrollment.enroll(self.students[1].pk, course.pk), (True, 2))
+
+        stats = InstructorStats.objects.get(instructor=self.instructor)
+        self.assertEqual((stats.total_enrollments, stats.total_students), (2, 2))
+        self.assertEqual(
+            list(EnrollmentRollup.objects.filter(course=course).values_list("day", "enrollments")),
+            [(timezone.localdate(), 2)],
+        )
+
+    def test_students_counted_once_per_instructor(self):
+        courses = [self.create_course(self.instructor) for _ in range(2)]
+
+        def counted():
+            stats = InstructorStats.objects.get(instructor=self.instructor)
+            return stats.total_enrollments, stats.total_students
+
+        for course in courses:
+            enrollment.enroll(self.students[0].pk, course.pk)
+        self.assertEqual(counted(), (2, 1))
+
+        Enrollment.objects.get(user=self.students[0], course=courses[0]).delete()
+        self.assertEqual(counted(), (1, 1))
+        Enrollment.objects.get(user=self.students[0], course=courses[1]).delete()
+        self.assertEqual(counted(), (0, 0))
+
+
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw"
+        )
+        cls.course = Course.objects.create(
+            creator=cls.instructor, title="Course", description="", is_published=True
+        )
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+        cls.visitor = User.objects.create_user(
+            email="visitor@example.com", user_name="visitor", password="pw"
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+        self.tokens = {
+            user: PermissionRefreshToken.for_user(user).access_token
+            for user in (self.student, self.visitor)
+        }
+
+    def get_detail(self, user=None, **headers):
+        if user is None:
+            self.client.credentials()
+        else:
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens[user]}")
+        return self.client.get(f"/api/courses/{self.course.pk}/", headers=headers)
+
+    def test_full_copy_revalidates_without_queries(self):
+        etag = self.get_detail(self.student)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.get_detail(self.student, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_public_copy_checks_access(self):
+        etag = self.get_detail()["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.get_detail(self.visitor, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # a student who enrolled since must get the full copy
+        response = self.get_detail(self.student, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(ALLOWED_HOSTS=["one.example.com", "two.example.com"])
+    def test_copies_per_host(self):
+        etag = self.get_detail(host="one.example.com")["ETag"]
+
+        response = self.get_detail(host="two.example.com", if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_catalog_bumped_for_listed_courses_only(self):
+        def catalog_changes(change):
+            with mock.patch("courses.response_cache.schedule_bump") as schedule_bump:
+                change()
+            return schedule_bump.call_args.kwargs["catalog"]
+
+        draft = Course.objects.create(creator=self.instructor, title="Draft", description="")
+
+        def publish(course, value):
+            course.is_published = value
+            course.save()
+
+        def rename(course):
+            course.title += "!"
+            course.save()
+
+        self.assertFalse(catalog_changes(lambda: rename(draft)))
+        self.assertTrue(catalog_changes(lambda: publish(draft, True)))
+        self.assertTrue(catalog_changes(lambda: rename(draft)))
+        self.assertTrue(catalog_changes(lambda: publish(draft, False)))
+        self.assertFalse(catalog_changes(lambda: rename(draft)))
+        self.assertFalse(catalog_changes(lambda: Course.objects.create(
+            creator=self.instructor, title="Another draft", description=""
+        )))
+        self.assertTrue(catalog_changes(self.course.delete))
+
+class SearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.course = Course.objects.create(
+            creator=instructor, title="Python basics", description="", is_published=True
+        )
+        rebuild_documents()
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_processes_see_each_others_changes(self):
+        # two backends stand in for two worker processes sharing the cache
+        first, second = InvertedIndexBackend(), InvertedIndexBackend()
+        self.assertEqual([hit[0] for hit in first.search("pyth", 10)], [self.course.pk])
+
+        document = CourseSearchDocument.objects.get(course=self.course)
+        document.title = "Rust basics"
+        document.save()
+        second.index(document)
+
+        self.assertEqual(first.search("pyth", 10), [])
+        self.assertEqual([hit[0] for hit in first.search("rust", 10)], [self.course.pk])
+        self.assertEqual(second.search("pyth", 10), [])
+
+    def test_mysql_query_skips_terms_the_index_drops(self):
+        backend = MySQLFullTextBackend()
+        self.assertEqual(backend.boolean_query("Intro to the ML of Python"), "+intro* +python*")
+        self.assertEqual(backend.boolean_query("a to"), "")
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        courses = Course.objects.bulk_create(
+            Course(creator=instructor, title=f"Course {i}", description="", is_published=True)
+            for i in range(25)
+        )
+        # ties on created_at are broken by id
+        Course.objects.filter(pk__in=[course.pk for course in courses[5:15]]).update(
+            created_at=courses[5].created_at
+        )
+        cls.expected = list(
+            Course.objects.order_by("-created_at", "-id").values_list("pk", flat=True)
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([course["id"] for course in response.data["results"]])
+            url = response.data[link]
+        return pages
+
+    def test_links_cover_every_row_once(self):
+        pages = self.walk("/api/courses/?page_size=7", "next")
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+
+        last = self.client.get("/api/courses/?page_size=7")
+        for _ in range(3):
+            last = self.client.get(last.data["next"])
+        back = self.walk(last.data["previous"], "previous")
+        self.assertEqual([pk for page in reversed(back) for pk in page], self.expected[:21])
+
+    def test_tampered_cursors(self):
+        position = base64.urlsafe_b64encode(b'{"p":[1,2],"r":0}').decode()
+        for cursor in ["garbage", "e30=", position, base64.urlsafe_b64encode(b'{"p":[1],"r":0}').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/courses/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class OrderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        course = Course.objects.create(creator=instructor, title="Course", description="")
+        cls.section = Section.objects.create(course=course, title="Part")
+
+    def create_chapter(self, title, **kwargs):
+        return Chapter.objects.create(
+            section=self.section,
+            title=title,
+            video_url="https://example.com/v",
+            video_duration=1,
+            **kwargs,
+        )
+
+    def titles(self):
+        return list(self.section.chapters.values_list("title", flat=True))
+
+    def test_inserts_between_neighbours(self):
+        for title in "ace":
+            self.create_chapter(title)
+        self.create_chapter("b", order=2)
+        self.create_chapter("d", order=4)
+        self.create_chapter("_", order=1)
+
+        self.assertEqual(self.titles(), ["_", "a", "b", "c", "d", "e"])
+        self.assertEqual(
+            [chapter.order for chapter in self.section.chapters.all()], [1, 2, 3, 4, 5, 6]
+        )
+
+    def test_exhausted_gap_renormalizes(self):
+        self.create_chapter("first")
+        self.create_chapter("last")
+        # inserting at the same spot halves the gap every time
+        for i in range(20):
+            self.create_chapter(f"middle {i}", order=2)
+
+        self.assertEqual(
+            self.titles(), ["first", *[f"middle {i}" for i in reversed(range(20))], "last"]
+        )
+        keys = list(self.section.chapters.values_list("sort_key", flat=True))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_adjacent_keys_renormalize(self):
+        first = self.create_chapter("first")
+        last = self.create_chapter("last")
+        Chapter.objects.filter(pk=last.pk).update(sort_key=first.sort_key + 1)
+
+        self.create_chapter("middle", order=2)
+
+        self.assertEqual(
+            list(self.section.chapters.values_list("title", "sort_key")),
+            [("first", GAP), ("middle", GAP + GAP // 2), ("last", 2 * GAP)],
+        )
+
+    @isolate_apps("courses")
+    def test_siblings_required(self):
+        class Unparented(PositionedModel):
+            pass
+
+        with self.assertRaisesMessage(NotImplementedError, "Unparented must define get_siblings()"):
+            Unparented().assign_sort_key()
+
+    def test_reorder_validation(self):
+        chapters = [self.create_chapter(title) for title in "abc"]
+        ids = [chapter.pk for chapter in chapters]
+        queryset = self.section.chapters.all()
+
+        for items in [
+            {"id": ids[0], "order": 1},
+            [{"order": 1}, {"id": ids[1], "order": 2}, {"id": ids[2], "order": 3}],
+            [{"id": "x", "order": 1}, {"id": ids[1], "order": 2}, {"id": ids[2], "order": 3}],
+            [{"id": ids[0], "order": 1}, {"id": ids[1], "order": 2}],
+            [{"id": pk, "order": 1} for pk in ids],
+            [{"id": pk, "order": i} for i, pk in enumerate([ids[0], ids[0], ids[1], ids[2]], start=1)],
+            [{"id": pk, "order": i} for i, pk in enumerate([*ids, 0], start=1)],
+        ]:
+            with self.subTest(items=items), self.assertRaises(ValidationError):
+                reorder(queryset, items)
+
+        self.assertEqual(self.titles(), ["a", "b", "c"])
+        reorder(queryset, [{"id": pk, "order": i} for i, pk in enumerate(reversed(ids), start=1)])
+        self.assertEqual(self.titles(), ["c", "b", "a"])
+
+
+
+class ReorderViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.course = Course.objects.create(creator=cls.instructor, title="Course", description="")
+        cls.section = Section.objects.create(course=cls.course, title="Part")
+        cls.chapter = Chapter.objects.create(
+            section=cls.section, title="Lesson", video_url="https://example.com/v", video_duration=1
+        )
+
+    def setUp(self):
+        token = PermissionRefreshToken.for_user(self.instructor).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_malformed_payloads(self):
+        item = {"id": self.section.pk, "order": 1}
+        for path, payload in [
+            ("section", {"course_id": "abc", "sections": [item]}),
+            ("section", {"course_id": [1], "sections": [item]}),
+            ("section", {"course_id": self.course.pk, "sections": {"id": 1}}),
+            ("section", {"sections": {"id": 1}}),
+            ("section", {"sections": [{"id": "abc", "order": 1}]}),
+            ("section", {"course_id": self.course.pk, "sections": [{"order": 1}]}),
+            ("section", {"course_id": self.course.pk, "sections": ["abc"]}),
+            ("chapter", {"section_id": "abc", "chapters": []}),
+            ("chapter", {"section_id": self.section.pk, "chapters": "abc"}),
+            ("chapter", {"section_id": self.section.pk, "chapters": [{"order": 1}]}),
+        ]:
+            with self.subTest(path=path, payload=payload):
+                response = self.client.patch(
+                    f"/api/courses/{path}/reorder/", data=payload, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_older_clients_without_course_id(self):
+        response = self.client.patch(
+            "/api/courses/section/reorder/",
+            data={"sections": [{"id": self.section.pk, "order": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+class AnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.course = Course.objects.create(creator=instructor, title="Course", description="")
+        students = [
+            User.objects.create_user(email=f"s{i}@example.com", user_name=f"s{i}", password="pw")
+            for i in range(5)
+        ]
+        # Monday 2024-01-01, twice on Wednesday, then the Monday after
+        days = ["2024-01-01", "2024-01-03", "2024-01-03", "2024-01-08", "2024-01-09"]
+        for student, day in zip(students, days):
+            Enrollment.objects.create(user=student, course=cls.course)
+            Enrollment.objects.filter(user=student).update(
+                enrolled_on=datetime.fromisoformat(f"{day}T12:00:00+00:00")
+            )
+        counters.rebuild_enrollment_rollups()
+
+    def test_daily_series(self):
+        series = enrollment_series([self.course.pk], date(2024, 1, 1), date(2024, 1, 4))
+        self.assertEqual(
+            [(bucket["date"], bucket["enrollments"]) for bucket in series[self.course.pk]],
+            [("2024-01-01", 1), ("2024-01-02", 0), ("2024-01-03", 2), ("2024-01-04", 0)],
+        )
+
+    def test_weekly_series(self):
+        series = enrollment_series(
+            [self.course.pk], date(2024, 1, 2), date(2024, 1, 14), interval="week"
+        )
+        self.assertEqual(
+            [(bucket["date"], bucket["enrollments"]) for bucket in series[self.course.pk]],
+            # the range starts on Tuesday, the first week's Monday is left out
+            [("2024-01-01", 2), ("2024-01-08", 2)],
+        )
+
+    def test_parse_range(self):
+        self.assertEqual(
+            parse_range({"from": "2024-01-01", "to": "2024-01-31", "interval": "week"}),
+            (date(2024, 1, 1), date(2024, 1, 31), "week"),
+        )
+        for params in [
+            {"interval": "month"},
+            {"from": "January"},
+            {"from": "2024-02-01", "to": "2024-01-01"},
+            {"from": "2023-01-01", "to": "2024-01-31"},
+        ]:
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                parse_range(params)
+
+
+class ProgressTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.student = User.objects.create_user(
+            email="student@example.com", user_name="student", password="pw"
+        )
+        cls.course = Course.objects.create(creator=instructor, title="Course", description="")
+        section = Section.objects.create(course=cls.course, title="Part")
+        cls.chapters = [
+            Chapter.objects.create(
+                section=section, title=f"Lesson {i}", video_url="https://example.com/v", video_duration=1
+            )
+            for i in range(2)
+        ]
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+
+    def record(self, chapter, position, completed=False):
+        progress.buffer.record(self.student.pk, self.course.pk, chapter.pk, position, completed)
+        progress.buffer.flush()
+        return Enrollment.objects.get(user=self.student, course=self.course)
+
+    def test_completing_every_chapter_completes_the_course(self):
+        enrolled = self.record(self.chapters[0], 30, completed=True)
+        self.assertEqual((enrolled.completed_chapters, enrolled.status), (1, "active"))
+        # later heartbeats on a completed chapter neither count it again
+        # nor un-complete it
+        enrolled = self.record(self.chapters[0], 40)
+        self.assertEqual((enrolled.completed_chapters, enrolled.last_position), (1, 40))
+        self.assertTrue(ChapterProgress.objects.get(chapter=self.chapters[0]).completed)
+
+        enrolled = self.record(self.chapters[1], 50, completed=True)
+        self.assertEqual((enrolled.completed_chapters, enrolled.status), (2, "completed"))
+        self.assertEqual(enrolled.last_chapter_id, self.chapters[1].pk)
+
+    def test_replayed_completion_counts_once(self):
+        pending = {
+            (self.student.pk, self.chapters[0].pk): {
+                "course_id": self.course.pk,
+                "position": 30,
+                "completed": True,
+                "updated_at": timezone.now(),
+            }
+        }
+        # two processes flushing the same heartbeat
+        progress.write_progress(pending)
+        progress.write_progress(pending)
+
+        enrolled = Enrollment.objects.get(user=self.student, course=self.course)
+        self.assertEqual((enrolled.completed_chapters, enrolled.status), (1, "active"))
+
+    def test_completion_written_elsewhere_is_kept(self):
+        buffer = progress.ProgressBuffer()
+        buffer.record(self.student.pk, self.course.pk, self.chapters[0].pk, 10)
+        # another process completes the chapter before this one flushes
+        ChapterProgress.objects.create(
+            user=self.student,
+            chapter=self.chapters[0],
+            course=self.course,
+            position=60,
+            completed=True,
+            updated_at=timezone.now(),
+        )
+        buffer.flush()
+
+        self.assertTrue(ChapterProgress.objects.get(chapter=self.chapters[0]).completed)
+        enrolled = Enrollment.objects.get(user=self.student, course=self.course)
+        self.assertEqual((enrolled.completed_chapters, enrolled.last_position), (1, 10))
+
+    def test_removed_chapters_update_status(self):
+        self.record(self.chapters[0], 30, completed=True)
+
+        # the course loses the one chapter left to watch
+        self.chapters[1].delete()
+        enrolled = Enrollment.objects.get(user=self.student, course=self.course)
+        self.assertEqual((enrolled.completed_chapters, enrolled.status), (1, "completed"))
+
+        Chapter.objects.create(
+            section=self.chapters[0].section,
+            title="Bonus",
+            video_url="https://example.com/v",
+            video_duration=1,
+        )
+        self.chapters[0].delete()
+        enrolled = Enrollment.objects.get(user=self.student, course=self.course)
+        self.assertEqual((enrolled.completed_chapters, enrolled.status), (0, "active"))
+
+    def test_reading_progress_writes_only_the_readers_heartbeats(self):
+        other = User.objects.create_user(
+            email="other@example.com", user_name="other", password="pw"
+        )
+        Enrollment.objects.create(user=other, course=self.course)
+        self.addCleanup(progress.buffer.flush)
+        progress.buffer.record(self.student.pk, self.course.pk, self.chapters[0].pk, 30)
+        progress.buffer.record(other.pk, self.course.pk, self.chapters[0].pk, 40)
+
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        response = self.client.get(
+            f"/api/courses/learn/{self.course.pk}/progress/",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(
+            response.data["chapters"],
+            [{"chapter": self.chapters[0].pk, "position": 30, "completed": False}],
+        )
+        self.assertFalse(ChapterProgress.objects.filter(user=other).exists())
+
+    def test_resume_from_pending_heartbeats(self):
+        self.record(self.chapters[0], 30)
+        self.addCleanup(progress.buffer.flush)
+        progress.buffer.record(self.student.pk, self.course.pk, self.chapters[0].pk, 60, completed=True)
+        progress.buffer.record(self.student.pk, self.course.pk, self.chapters[1].pk, 25)
+
+        token = PermissionRefreshToken.for_user(self.student).access_token
+        response = self.client.get(
+            f"/api/courses/learn/{self.course.pk}/resume/",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(
+            (response.data["chapter"]["id"], response.data["resume_position"]),
+            (self.chapters[1].pk, 25),
+        )
+        # answered without writing the heartbeats
+        self.assertFalse(ChapterProgress.objects.get(chapter=self.chapters[0]).completed)
+
+    @override_settings(PROGRESS_BUFFER={"FLUSH_INTERVAL": 0.01})
+    def test_timer_flushes_without_further_heartbeats(self):
+        flushed = threading.Event()
+        buffer = progress.ProgressBuffer()
+
+        with mock.patch("courses.progress.write_progress", side_effect=lambda pending: flushed.set()):
+            buffer.record(self.student.pk, self.course.pk, self.chapters[0].pk, 10)
+            self.assertTrue(flushed.wait(5))
+
+        self.assertEqual(buffer.flush(), 0)
+
+
+@override_settings(THUMBNAILS={
+    "WIDTHS": [32, 64], "FORMATS": ["jpeg"], "FALLBACK_WIDTH": 64, "BACKGROUND": False,
+})
+class ThumbnailTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            email="instructor@example.com", user_name="instructor", password="pw"
+        )
+        cls.course = Course.objects.create(creator=instructor, title="Course", description="")
+
+    def setUp(self):
+        caches["default"].clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        # an upload whose derivatives were never generated
+        image = io.BytesIO()
+        Image.new("RGB", (100, 50), "red").save(image, format="PNG")
+        name = default_storage.save("thumbnails/cover.png", ContentFile(image.getvalue()))
+        Course.objects.filter(pk=self.course.pk).update(thumbnail=name)
+        self.course.refresh_from_db()
+
+    def test_variants(self):
+        digest = thumbnails.ensure_derivatives(self.course.thumbnail)
+
+        for width, height in [(32, 16), (64, 32)]:
+            with default_storage.open(thumbnails.derivative_name(digest, width, "jpeg")) as file:
+                with Image.open(file) as image:
+                    self.assertEqual((image.format, image.size), ("JPEG", (width, height)))
+
+    def test_lazy_endpoint_then_stored_urls(self):
+        path = f"/api/courses/{self.course.pk}/thumbnail/32.jpg"
+        self.assertEqual(self.client.get(f"/api/courses/{self.course.pk}/thumbnail/48.jpg").status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 302)
+        self.course.refresh_from_db()
+        self.assertTrue(self.course.thumbnail_hash)
+        self.assertTrue(response["Location"].endswith(
+            thumbnails.derivative_name(self.course.thumbnail_hash, 32, "jpeg")
+        ))
+
+        sets = thumbnails.srcsets(self.course, lambda url: url)
+        self.assertEqual(
+            sets["jpeg"],
+            ", ".join(
+                f"{default_storage.url(thumbnails.derivative_name(self.course.thumbnail_hash, width, 'jpeg'))} {width}w"
+                for width in (32, 64)
+            ),
+        )
+        self.assertEqual(
+            sets["src"],
+            default_storage.url(thumbnails.derivative_name(self.course.thumbnail_hash, 64, "jpeg")),
+        )
+
+    def test_hash_stored_once_all_sizes_exist(self):
+        response = self.client.get(f"/api/courses/{self.course.pk}/thumbnail/32.jpg")
+        self.assertEqual(response.status_code, 302)
+        self.course.refresh_from_db()
+        # only one size exists, so pages keep using the lazy endpoint
+        self.assertFalse(self.course.thumbnail_hash)
+        self.assertTrue(thumbnails.srcsets(self.course, lambda url: url)["src"].endswith("/thumbnail/64.jpg"))
+
+        # the background run has not happened yet; the original is not
+        # hashed again for the next size
+        with mock.patch("courses.thumbnails.content_hash") as content_hash:
+            response = self.client.get(f"/api/courses/{self.course.pk}/thumbnail/64.jpg")
+        self.assertEqual(response.status_code, 302)
+        content_hash.assert_not_called()
+
+        thumbnails.generate(self.course.pk)
+        self.course.refresh_from_db()
+        for width in (32, 64):
+            self.assertTrue(default_storage.exists(
+                thumbnails.derivative_name(self.course.thumbnail_hash, width, "jpeg")
+            ))
+
+    @skipUnless(features.check("webp"), "Pillow was built without WebP")
+    def test_src_uses_last_format(self):
+        with override_settings(THUMBNAILS={"WIDTHS": [32], "FORMATS": ["jpeg", "webp"]}):
+            sets = thumbnails.srcsets(self.course, lambda url: url)
+
+        self.assertEqual(set(sets), {"jpeg", "webp", "src"})
+        self.assertTrue(sets["src"].endswith("/thumbnail/32.webp"))
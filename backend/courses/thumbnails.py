@@ -0,0 +1,206 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+from courses import response_cache
+from courses.models import Course
+from courses.utils import on_commit_once
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "WIDTHS": [160, 320, 640, 960],
+    # preferred first; the last one also serves the plain src
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": 80,
+    # plain src for clients without srcset support
+    "FALLBACK_WIDTH": 320,
+    # derivatives live next to the uploads, named by the original's hash
+    "DIRECTORY": "thumbnails/derived",
+    # generate in a worker thread after upload; False generates inline
+    "BACKGROUND": True,
+    # remembers the original's hash for the lazy endpoint until
+    # thumbnail_hash is stored
+    "CACHE": "default",
+}
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+_executor = None
+
+
+def get_options():
+    options = {**DEFAULTS, **getattr(settings, "THUMBNAILS", {})}
+    options["FORMATS"] = [
+        format for format in options["FORMATS"]
+        if format != "webp" or features.check("webp")
+    ]
+    if options["FALLBACK_WIDTH"] not in options["WIDTHS"]:
+        options["FALLBACK_WIDTH"] = options["WIDTHS"][0]
+    return options
+
+
+def derivative_name(digest, width, format):
+    return f"{get_options()['DIRECTORY']}/{digest}-{width}.{EXTENSIONS[format]}"
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()[:16]
+
+
+def _digest_cache():
+    return caches[get_options()["CACHE"]]
+
+
+def _digest_key(name):
+    return f"thumbnails:digest:{name}"
+
+
+def original_digest(thumbnail):
+    """
+    The content hash of an uploaded original, kept in the cache under its
+    file name so the lazy endpoint reads the whole file only once per
+    upload. Unlike thumbnail_hash it does not mean the derivatives exist.
+    """
+    cache = _digest_cache()
+    digest = cache.get(_digest_key(thumbnail.name))
+    if digest is None:
+        with thumbnail.open("rb") as file:
+            digest = content_hash(file)
+        cache.set(_digest_key(thumbnail.name), digest, None)
+    return digest
+
+
+def render(image, width, format, quality):
+    image = ImageOps.exif_transpose(image)
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    if format == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, format=format.upper(), quality=quality)
+    return output.getvalue()
+
+
+def ensure_derivatives(thumbnail, sizes=None, digest=None):
+    """
+    Write the (width, format) derivatives of an uploaded image that are
+    not on disk yet and return the original's content hash, which is only
+    looked up when ``digest`` is not given. Names only depend on that hash,
+    so existing files are never rewritten.
+    """
+    options = get_options()
+    if sizes is None:
+        sizes = [
+            (width, format)
+            for width in options["WIDTHS"]
+            for format in options["FORMATS"]
+        ]
+
+    if digest is None:
+        digest = original_digest(thumbnail)
+
+    missing = [
+        (width, format) for width, format in sizes
+        if not default_storage.exists(derivative_name(digest, width, format))
+    ]
+    if missing:
+        with thumbnail.open("rb") as file, Image.open(file) as image:
+            image.load()
+            for width, format in missing:
+                default_storage.save(
+                    derivative_name(digest, width, format),
+                    ContentFile(render(image, width, format, options["QUALITY"])),
+                )
+    return digest
+
+
+def store_hash(course_id, name, digest):
+    # only if the thumbnail was not replaced meanwhile
+    return Course.objects.filter(pk=course_id, thumbnail=name).update(thumbnail_hash=digest)
+
+
+def generate(course_id):
+    course = Course.objects.filter(pk=course_id).only("thumbnail").first()
+    if course is None or not course.thumbnail:
+        return
+
+    digest = ensure_derivatives(course.thumbnail)
+
+    # cached pages switch from the lazy endpoint to the derivatives now
+    # that all of them exist; nothing else stores the hash, so srcsets
+    # never name a derivative that was not written
+    if store_hash(course_id, course.thumbnail.name, digest):
+        # a later upload may reuse the file name
+        _digest_cache().delete(_digest_key(course.thumbnail.name))
+        response_cache.schedule_bump(course_id, catalog=True)
+
+
+def _run(course_id):
+    try:
+        generate(course_id)
+    except Exception:
+        logger.exception("Generating thumbnails for course %s failed", course_id)
+    finally:
+        connections.close_all()
+
+
+def schedule(course_id):
+    def submit():
+        global _executor
+
+        if not get_options()["BACKGROUND"]:
+            generate(course_id)
+            return
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+        _executor.submit(_run, course_id)
+
+    on_commit_once(("thumbnails", course_id), submit)
+
+
+def srcsets(course, build_url):
+    """
+    srcset strings per format for a course card. Before the derivatives
+    exist the URLs point at the lazy endpoint, which renders on demand.
+    """
+    if not course.thumbnail:
+        return None
+
+    options = get_options()
+    if course.thumbnail_hash:
+        url = lambda width, format: default_storage.url(
+            derivative_name(course.thumbnail_hash, width, format)
+        )
+    else:
+        url = lambda width, format: reverse(
+            "course-thumbnail",
+            kwargs={"pk": course.pk, "width": width, "extension": EXTENSIONS[format]},
+        )
+
+    result = {
+        format: ", ".join(
+            f"{build_url(url(width, format))} {width}w" for width in options["WIDTHS"]
+        )
+        for format in options["FORMATS"]
+    }
+    # the last format is the most widely supported one
+    result["src"] = build_url(url(options["FALLBACK_WIDTH"], options["FORMATS"][-1]))
+    return result
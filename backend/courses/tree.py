@@ -0,0 +1,54 @@
+from django.db.models import Prefetch, aprefetch_related_objects, prefetch_related_objects
+
+from courses.models import Chapter, Section
+
+
+def course_tree_prefetch():
+    return Prefetch(
+        "sections",
+        queryset=Section.objects.order_by("sort_key", "id").prefetch_related(
+            Prefetch("chapters", queryset=Chapter.objects.order_by("sort_key", "id"))
+        ),
+    )
+
+
+def attach_course_tree(course):
+    # two queries: the course's sections, then all of their chapters
+    prefetch_related_objects([course], course_tree_prefetch())
+    return number_course_tree(course)
+
+
+async def aattach_course_tree(course):
+    await aprefetch_related_objects([course], course_tree_prefetch())
+    return number_course_tree(course)
+
+
+def number_course_tree(course):
+    course.total_hours = 0
+    course.chapter_count = 0
+
+    # dense 1..n positions for the API, see PositionedModel.order
+    for position, section in enumerate(course.sections.all(), start=1):
+        section._position = position
+        chapters = section.chapters.all()
+        for chapter_position, chapter in enumerate(chapters, start=1):
+            chapter._position = chapter_position
+
+        section.total_hours = sum(chapter.video_duration for chapter in chapters)
+        section.chapter_count = len(chapters)
+
+        course.total_hours += section.total_hours
+        course.chapter_count += section.chapter_count
+
+    return course
+
+
+def attach_section_chapters(section):
+    # one query for the chapters, numbered the same way as above
+    prefetch_related_objects(
+        [section], Prefetch("chapters", queryset=Chapter.objects.order_by("sort_key", "id"))
+    )
+    for position, chapter in enumerate(section.chapters.all(), start=1):
+        chapter._position = position
+
+    return section
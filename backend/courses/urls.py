@@ -1,15 +1,19 @@
 from django.urls import path
 from courses.view_list.course_views import (
     CreateCourseView,
+    ImportCourseView,
     UpdateCourseView,
     CourseDetailView,
 
     EnrollCourseView,
+    BulkEnrollView,
     CourseListView,
     MyEnrollmentsView,
     MyCoursesView,
     TogglePublishCourseView,
+    CourseThumbnailView,
     InstructorDashboardView,
+    InstructorAnalyticsView,
     InstructorCourseDetailView,
     LearnCourseView,
 )
@@ -28,6 +32,8 @@ from courses.view_list.chapter_views import (
     ReorderChapterView,
 )
 
+from courses.view_list.progress_views import ChapterProgressView, ResumeCourseView
+
 urlpatterns = [
     path("", CourseListView.as_view()),
 
@@ -36,9 +42,12 @@ urlpatterns = [
 
 
     path("create/", CreateCourseView.as_view(), name="create-course"),
+    path("import/", ImportCourseView.as_view(), name="import-course"),
     path("<int:pk>/update/", UpdateCourseView.as_view(), name="update-course"),
     path("<int:pk>/", CourseDetailView.as_view(), name = 'course-detail'),
     path("learn/<int:pk>/",LearnCourseView.as_view(),),
+    path("learn/<int:pk>/progress/", ChapterProgressView.as_view()),
+    path("learn/<int:pk>/resume/", ResumeCourseView.as_view()),
     
     path("section/create/", CreateSectionView.as_view()),
     path("section/<int:pk>/update/", UpdateSectionView.as_view()),
@@ -53,10 +62,17 @@ urlpatterns = [
 
 
     path("<int:course_id>/enroll/", EnrollCourseView.as_view()),
+    path("<int:course_id>/bulk-enroll/", BulkEnrollView.as_view()),
     path("<int:pk>/toggle-publish/", TogglePublishCourseView.as_view()),
+    path(
+        "<int:pk>/thumbnail/<int:width>.<str:extension>",
+        CourseThumbnailView.as_view(),
+        name="course-thumbnail",
+    ),
 
 
     path("instructor/dashboard/", InstructorDashboardView.as_view()),
+    path("instructor/analytics/", InstructorAnalyticsView.as_view()),
     path("instructor/course/<int:pk>/",InstructorCourseDetailView.as_view()),
 
 ]
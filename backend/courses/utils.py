@@ -0,0 +1,17 @@
+from functools import partial
+
+from django.db import transaction
+
+
+def on_commit_once(key, func, *args):
+    """
+    Run ``func(*args)`` when the current transaction commits, at most once
+    per ``key`` however many writes in the transaction ask for it.
+    """
+    for _, callback, *_ in transaction.get_connection().run_on_commit:
+        if getattr(callback, "commit_key", None) == key:
+            return
+
+    callback = partial(func, *args)
+    callback.commit_key = key
+    transaction.on_commit(callback)
@@ -0,0 +1,188 @@
+"""
+Async counterparts of the hot read endpoints, which the ASGI application
+serves in place of the DRF views (see backend.asgi_urls). They answer the
+same requests with the same bodies, but await the database and the cache
+instead of holding a thread, so one worker process can keep many slow
+clients going at once.
+
+DRF views are sync only. ``AsyncAPIView`` covers what these endpoints
+need from APIView: stateless JWT authentication, JSON rendering and DRF's
+error responses.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from courses import response_cache
+from courses.access import ahas_video_access
+from courses.filters import CourseSearchFilter
+from courses.models import Course, Enrollment
+from courses.pagination import KeysetPagination
+from courses.serializers import CourseDetailSerializer, CourseListSerializer
+from courses.tree import aattach_course_tree
+
+
+class AsyncAPIView(View):
+    http_method_names = ["get", "head", "options"]
+    authentication_class = JWTStatelessUserAuthentication
+    # False where anonymous users may read too
+    authentication_required = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        # DRF's request for query_params and the serializers; it only parses
+        # a body when asked to
+        self.request = Request(request)
+        try:
+            self.request.user = self.authenticate(request)
+            return await super().dispatch(self.request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    def authenticate(self, request):
+        result = self.authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+        if self.authentication_required:
+            raise NotAuthenticated()
+        return AnonymousUser()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authentication_class().authenticate_header(self.request)
+
+        response = exception_handler(exc, {"view": self, "request": self.request})
+        if response is None:
+            raise exc
+
+        rendered = self.render(response.data, response.status_code)
+        # WWW-Authenticate, Retry-After
+        for header, value in response.items():
+            if header != "Content-Type":
+                rendered[header] = value
+        return rendered
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            JSONRenderer().render(data), status=status, content_type="application/json"
+        )
+
+    def get_serializer_context(self):
+        return {"request": self.request, "view": self}
+
+    async def cached_response(self, key, build, cacheable=None):
+        etag = response_cache.etag_for(key)
+
+        if response_cache.not_modified(self.request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = self.render(await response_cache.acached_data(key, build, cacheable))
+
+        response["ETag"] = etag
+        return response
+
+    async def paginate(self, queryset, serializer_class):
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, self.request, self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data).data
+
+
+class AsyncCourseListView(AsyncAPIView):
+    authentication_required = False
+    # the page, plus loading the search index on a process's first search
+    query_budget = 2
+
+    @property
+    def keyset_ordering(self):
+        if CourseSearchFilter().get_search_query(self.request):
+            return ("-search_rank", "-id")
+        return ("-created_at", "-id")
+
+    async def get(self, request):
+        return await self.cached_response(await response_cache.acatalog_key(request), self.list)
+
+    async def list(self):
+        queryset = Course.objects.filter(is_published=True).for_listing()
+
+        search = CourseSearchFilter()
+        if search.get_search_query(self.request):
+            # the search backend may load its index or query MySQL first
+            queryset = await sync_to_async(search.filter_queryset)(self.request, queryset, self)
+
+        return await self.paginate(queryset, CourseListSerializer)
+
+
+class AsyncMyEnrollmentsView(AsyncAPIView):
+    keyset_ordering = ("-enrolled_on", "-id")
+    query_budget = 1
+
+    async def get(self, request):
+        queryset = Course.objects.filter(
+            enrollments__user_id=request.user.id
+        ).annotate(
+            enrolled_on=F("enrollments__enrolled_on")
+        ).for_listing()
+
+        return self.render(await self.paginate(queryset, CourseListSerializer))
+
+
+class AsyncCourseDetailView(AsyncAPIView):
+    authentication_required = False
+    query_budget = 4
+
+    async def get(self, request, pk):
+        # see CourseDetailView
+        full = response_cache.etag_for(
+            await response_cache.adetail_key(request, pk, "full")
+        )
+        if request.user.is_authenticated and response_cache.not_modified(request, full):
+            response = HttpResponseNotModified()
+            response["ETag"] = full
+            patch_vary_headers(response, ("Authorization",))
+            return response
+
+        video_access = await ahas_video_access(request.user, pk)
+        variant = "full" if video_access else "public"
+
+        response = await self.cached_response(
+            await response_cache.adetail_key(request, pk, variant),
+            partial(self.retrieve, pk, video_access),
+            cacheable=lambda data: data["is_published"],
+        )
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    async def retrieve(self, pk, video_access):
+        course = await aattach_course_tree(await aget_object_or_404(Course, pk=pk))
+        context = {**self.get_serializer_context(), "video_access": video_access}
+        return CourseDetailSerializer(course, context=context).data
+
+
+class AsyncLearnCourseView(AsyncAPIView):
+    query_budget = 4
+
+    async def get(self, request, pk):
+        course = await aget_object_or_404(Course, pk=pk)
+
+        # creators and enrolled students only
+        if course.creator_id != request.user.id and not await Enrollment.objects.filter(
+            user_id=request.user.id, course=course
+        ).aexists():
+            raise PermissionDenied("You must enroll to access this course.")
+
+        serializer = CourseDetailSerializer(
+            await aattach_course_tree(course),
+            context={"video_access": True}
+        )
+        return self.render(serializer.data)
@@ -2,20 +2,27 @@ from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from courses.models import Chapter, Course, Section, Enrollment
 from courses.serializers import (
     ChapterSerializer,
 )
 
-from accounts.utils import has_permission
-from django.db import transaction
+from courses import response_cache
+from courses.reorder import parse_id, reorder
 
 
 class CreateChapterView(generics.CreateAPIView):
     serializer_class = ChapterSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 12
+
+    def get_serializer_context(self):
+        # only the course creator gets past the checks below
+        context = super().get_serializer_context()
+        context["video_access"] = True
+        return context
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -24,37 +31,45 @@ class CreateChapterView(generics.CreateAPIView):
         if not section_id:
             raise PermissionDenied("Section ID is required")
 
-        section = get_object_or_404(Section, id=section_id)
+        section = get_object_or_404(Section.objects.select_related("course"), id=section_id)
         course = section.course
 
-        if course.creator != user:
+        if course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         serializer.save(section=section)
 
 class UpdateChapterView(generics.UpdateAPIView):
-    queryset = Chapter.objects.all()
+    queryset = Chapter.objects.select_related("section__course")
     serializer_class = ChapterSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 11
+
+    def get_serializer_context(self):
+        # only the course creator gets past the checks below
+        context = super().get_serializer_context()
+        context["video_access"] = True
+        return context
 
     def get_object(self):
         chapter = super().get_object()
         user = self.request.user
 
-        if chapter.section.course.creator != user:
+        if chapter.section.course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         return chapter
 
 class DeleteChapterView(generics.DestroyAPIView):
-    queryset = Chapter.objects.all()
+    queryset = Chapter.objects.select_related("section__course")
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 14
 
     def get_object(self):
         chapter = super().get_object()
         user = self.request.user
 
-        if chapter.section.course.creator != user:
+        if chapter.section.course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         return chapter
@@ -65,6 +80,7 @@ class DeleteChapterView(generics.DestroyAPIView):
 
 class ReorderChapterView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
 
     def patch(self, request):
 
@@ -76,20 +92,20 @@ class ReorderChapterView(APIView):
                 {"detail": "section_id is required"},
                 status=400
             )
+        if not isinstance(chapters, list):
+            raise ValidationError({"chapters": "Expected a list of {id, order} items"})
 
-        section = get_object_or_404(Section, id=section_id)
+        section = get_object_or_404(
+            Section.objects.select_related("course"), id=parse_id(section_id, "section_id")
+        )
 
         # Only creator can reorder
-        if section.course.creator != request.user:
+        if section.course.creator_id != request.user.id:
             raise PermissionDenied(
                 "You can only modify your own course"
             )
 
-        with transaction.atomic():
-            for item in chapters:
-                Chapter.objects.filter(
-                    id=item["id"],
-                    section=section
-                ).update(order=item["order"])
+        order = reorder(Chapter.objects.filter(section=section), chapters)
+        response_cache.schedule_bump(section.course_id)
 
-        return Response({"status": "reordered"})
+        return Response({"status": "reordered", "chapters": order})
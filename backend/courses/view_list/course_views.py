@@ -1,40 +1,74 @@
+import io
+import os
+from functools import partial
+
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import HttpResponseRedirect
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework import filters
-from courses.models import Course, Enrollment
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from django.db.models import F
+from courses.models import Course, Enrollment, InstructorStats
 from courses.serializers import (
     CourseSerializer,
     CourseDetailSerializer,
+    CourseImportSerializer,
     CourseListSerializer,
 )
 
-from accounts.utils import has_permission
+from courses.filters import CourseSearchFilter
+from courses.tree import attach_course_tree
+from courses.access import has_video_access
+from courses.analytics import enrollment_series, parse_range
+from courses.enrollment import BulkEnrollError, bulk_enroll, enroll, iter_emails
+from courses import response_cache, thumbnails
+from accounts.permissions import HasTokenPermission, IsTokenStaff
 
-CREATE_COURSE = 1
-UPDATE_COURSE = 2
-ENROLL_COURSE = 5
+CREATE_COURSE = "create_course"
+UPDATE_COURSE = "edit_own_course"
+ENROLL_COURSE = "enroll_course"
 
 
 class CreateCourseView(generics.CreateAPIView):
     serializer_class = CourseSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, HasTokenPermission]
+    required_permission = CREATE_COURSE
+    permission_denied_message = "You cannot create courses"
+    query_budget = 7
 
     def perform_create(self, serializer):
-        user = self.request.user
-
-        if not has_permission(user, CREATE_COURSE):
-            raise PermissionDenied("You cannot create courses")
-        
-        serializer.save(creator=user)
+        serializer.save(creator=self.request.user)
     
+class ImportCourseView(APIView):
+    permission_classes = [permissions.IsAuthenticated, HasTokenPermission]
+    required_permission = CREATE_COURSE
+    permission_denied_message = "You cannot create courses"
+    query_budget = 12
+
+    def post(self, request):
+        serializer = CourseImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course = serializer.save(creator=request.user)
+
+        serializer = CourseDetailSerializer(
+            attach_course_tree(course),
+            context={"video_access": True}
+        )
+        return Response(serializer.data, status=201)
+
 class UpdateCourseView(generics.UpdateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     parser_classes = [MultiPartParser, FormParser]
+    permission_classes = [permissions.IsAuthenticated, HasTokenPermission]
+    required_permission = UPDATE_COURSE
+    permission_denied_message = "No permission to edit course"
+    query_budget = 9
 
     def get_object(self):
         course = super().get_object()
@@ -43,80 +77,194 @@ class UpdateCourseView(generics.UpdateAPIView):
         if course.creator != user:
             raise PermissionDenied("You can only edit your own course")
         
-        if not has_permission(user, UPDATE_COURSE):
-            raise PermissionDenied("No permission to edit course")
         return course
 
 class CourseDetailView(generics.RetrieveAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseDetailSerializer
+    authentication_classes = [JWTStatelessUserAuthentication]
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        # a client already holding the full copy learns nothing from a 304,
+        # so it can have one before the access query; the public copy is
+        # only current for users who still lack access
+        full = response_cache.etag_for(
+            response_cache.detail_key(request, kwargs["pk"], "full")
+        )
+        if request.user.is_authenticated and response_cache.not_modified(request, full):
+            response = response_cache.not_modified_response(full)
+            patch_vary_headers(response, ("Authorization",))
+            return response
+
+        self.video_access = has_video_access(request.user, kwargs["pk"])
+        variant = "full" if self.video_access else "public"
+
+        response = response_cache.cached_response(
+            request,
+            response_cache.detail_key(request, kwargs["pk"], variant),
+            partial(super().get, request, *args, **kwargs),
+            cacheable=lambda response: response.data["is_published"],
+        )
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def get_object(self):
+        return attach_course_tree(super().get_object())
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["request"] = self.request
+        context["video_access"] = self.video_access
         return context
 
 class CourseListView(generics.ListAPIView):
     serializer_class = CourseListSerializer
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["title", "description"]
+    filter_backends = [CourseSearchFilter]
+    # the page, plus loading the search index on a process's first search
+    query_budget = 2
+
+    @property
+    def keyset_ordering(self):
+        # search results page through by relevance instead of recency
+        if CourseSearchFilter().get_search_query(self.request):
+            return ("-search_rank", "-id")
+        return ("-created_at", "-id")
+
+    def get(self, request, *args, **kwargs):
+        return response_cache.cached_response(
+            request,
+            response_cache.catalog_key(request),
+            partial(super().get, request, *args, **kwargs),
+        )
 
     def get_queryset(self):
-        return Course.objects.filter(is_published = True)
+        return Course.objects.filter(is_published = True).for_listing()
 
 class MyCoursesView(generics.ListAPIView):
     serializer_class = CourseListSerializer
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 1
 
     def get_queryset(self):
         return Course.objects.filter(
-            creator=self.request.user
-        )
+            creator_id=self.request.user.id
+        ).for_listing()
 
 class MyEnrollmentsView(generics.ListAPIView):
     serializer_class = CourseListSerializer
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ("-enrolled_on", "-id")
+    query_budget = 1
 
     def get_queryset(self):
         return Course.objects.filter(
-            enrollments__user=self.request.user
-        )
+            enrollments__user_id=self.request.user.id
+        ).annotate(
+            enrolled_on=F("enrollments__enrolled_on")
+        ).for_listing()
 
 class EnrollCourseView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated, HasTokenPermission]
+    required_permission = ENROLL_COURSE
+    permission_denied_message = "You are not allowed to enroll"
+    query_budget = 8
 
     def post(self, request, course_id):
-        user = request.user
-
-        if not has_permission(user, ENROLL_COURSE):
-            raise PermissionDenied("You are not allowed to enroll")
-        
-        
-
-        course = get_object_or_404(Course, id=course_id)
+        creator_id = get_object_or_404(
+            Course.objects.values_list("creator_id", flat=True),
+            id=course_id,
+        )
 
-        if course.creator == user:
+        if creator_id == request.user.id:
             return Response(
                 {"status": "creator has access automatically"},
                 status=200
             )
 
-
-        enrollment, created = Enrollment.objects.get_or_create(
-            user=user,
-            course=course
-        )
+        created, enrollment_count = enroll(request.user.id, course_id)
 
         if created:
-            return Response({"status": "enrolled"}, status=201)
+            return Response(
+                {"status": "enrolled", "enrollment_count": enrollment_count},
+                status=201
+            )
         else:
-            return Response({"status": "already enrolled"}, status=200)
+            return Response(
+                {"status": "already enrolled", "enrollment_count": enrollment_count},
+                status=200
+            )
 
 
 
+class BulkEnrollView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated, IsTokenStaff]
+    parser_classes = [MultiPartParser]
+    query_budget = 11
+
+    def post(self, request, course_id):
+        course = get_object_or_404(Course, id=course_id)
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Upload a CSV or JSONL file as 'file'"}, status=400)
+
+        format = request.data.get("format") or os.path.splitext(upload.name)[1].lstrip(".").lower()
+
+        # large uploads are spooled to disk by Django and read line by line
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = bulk_enroll(course, iter_emails(lines, format))
+        except BulkEnrollError as exc:
+            # earlier chunks are committed; say how far it got
+            return Response({"detail": str(exc), **exc.result}, status=400)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        return Response(result)
+
+
+class CourseThumbnailView(APIView):
+    permission_classes = [permissions.AllowAny]
+    query_budget = 1
+
+    def get(self, request, pk, width, extension):
+        formats = {ext: format for format, ext in thumbnails.EXTENSIONS.items()}
+        options = thumbnails.get_options()
+
+        if width not in options["WIDTHS"] or formats.get(extension) not in options["FORMATS"]:
+            raise NotFound()
+
+        course = get_object_or_404(Course.objects.only("thumbnail", "thumbnail_hash"), pk=pk)
+        if not course.thumbnail:
+            raise NotFound()
+
+        # render just this size now; the rest follow in the background,
+        # which stores the hash once all of them exist
+        digest = thumbnails.ensure_derivatives(
+            course.thumbnail,
+            [(width, formats[extension])],
+            digest=course.thumbnail_hash or None,
+        )
+        if not course.thumbnail_hash:
+            thumbnails.schedule(course.pk)
+
+        response = HttpResponseRedirect(request.build_absolute_uri(
+            default_storage.url(thumbnails.derivative_name(digest, width, formats[extension]))
+        ))
+        patch_cache_control(response, max_age=300)
+        return response
+
+
 class TogglePublishCourseView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 12
 
     def patch(self, request, pk):
         course = get_object_or_404(Course, pk=pk)
@@ -134,64 +282,104 @@ class TogglePublishCourseView(APIView):
 
 
 class InstructorCourseDetailView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request, pk):
         course = get_object_or_404(Course, pk=pk)
 
-        if course.creator != request.user:
+        if course.creator_id != request.user.id:
             raise PermissionDenied(
                 "You can only access your own courses."
             )
 
-        serializer = CourseDetailSerializer(course)
+        serializer = CourseDetailSerializer(
+            attach_course_tree(course),
+            context={"video_access": True}
+        )
         return Response(serializer.data)
 
 
 class InstructorDashboardView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 1
 
     def get(self, request):
-        user = request.user
+        stats = InstructorStats.objects.filter(
+            instructor_id=request.user.id
+        ).first() or InstructorStats()
+
+        return Response({
+            "total_courses": stats.total_courses,
+            "published_courses": stats.published_courses,
+            "unpublished_courses": stats.total_courses - stats.published_courses,
+            "total_enrollments": stats.total_enrollments,
+            "total_students": stats.total_students,
+        })
 
-        courses = Course.objects.filter(creator=user)
 
-        total_courses = courses.count()
-        published_courses = courses.filter(is_published=True).count()
-        unpublished_courses = courses.filter(is_published=False).count()
 
-        total_enrollments = Enrollment.objects.filter(
-            course__creator=user
-        ).count()
+class InstructorAnalyticsView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 2
 
-        total_students = Enrollment.objects.filter(
-            course__creator=user
-        ).values("user").distinct().count()
+    def get(self, request):
+        try:
+            start, end, interval = parse_range(request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        courses = Course.objects.filter(creator_id=request.user.id)
+
+        course_id = request.query_params.get("course")
+        if course_id:
+            if not course_id.isdigit():
+                return Response({"detail": "course must be an id"}, status=400)
+            courses = courses.filter(pk=course_id)
+
+        courses = list(courses.order_by("pk").values("id", "title"))
+        series = enrollment_series(
+            [course["id"] for course in courses], start, end, interval
+        )
 
         return Response({
-            "total_courses": total_courses,
-            "published_courses": published_courses,
-            "unpublished_courses": unpublished_courses,
-            "total_enrollments": total_enrollments,
-            "total_students": total_students,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "interval": interval,
+            "courses": [
+                {
+                    **course,
+                    "total": sum(point["enrollments"] for point in series[course["id"]]),
+                    "series": series[course["id"]],
+                }
+                for course in courses
+            ],
         })
 
 
 
 class LearnCourseView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
 
     def get(self, request, pk):
         course = get_object_or_404(Course, pk=pk)
 
         # Allow creator
-        if course.creator == request.user:
-            serializer = CourseDetailSerializer(course)
+        if course.creator_id == request.user.id:
+            serializer = CourseDetailSerializer(
+                attach_course_tree(course),
+                context={"video_access": True}
+            )
             return Response(serializer.data)
 
         # Allow enrolled students
         is_enrolled = Enrollment.objects.filter(
-            user=request.user,
+            user_id=request.user.id,
             course=course
         ).exists()
 
@@ -200,5 +388,8 @@ class LearnCourseView(APIView):
                 "You must enroll to access this course."
             )
 
-        serializer = CourseDetailSerializer(course)
+        serializer = CourseDetailSerializer(
+            attach_course_tree(course),
+            context={"video_access": True}
+        )
         return Response(serializer.data)
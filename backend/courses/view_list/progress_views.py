@@ -0,0 +1,110 @@
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from courses.models import ChapterProgress, Enrollment
+from courses.outline import get_outline, resume_position
+from courses.progress import buffer, can_track
+from courses.serializers import ProgressHeartbeatSerializer
+
+
+class ChapterProgressView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 6
+
+    def get(self, request, pk):
+        # include this learner's heartbeats still pending in this process
+        buffer.flush(request.user.id)
+
+        enrollment = Enrollment.objects.filter(
+            user_id=request.user.id, course_id=pk
+        ).values("status", "completed_chapters", "course__chapter_count").first()
+
+        if enrollment is None:
+            raise PermissionDenied("You must enroll to track progress.")
+
+        chapter_count = enrollment["course__chapter_count"]
+        completed = min(enrollment["completed_chapters"], chapter_count)
+
+        chapters = ChapterProgress.objects.filter(
+            user_id=request.user.id, course_id=pk
+        ).values("chapter", "position", "completed")
+
+        return Response({
+            "status": enrollment["status"],
+            "completed_chapters": completed,
+            "chapter_count": chapter_count,
+            "percent": round(100 * completed / chapter_count, 1) if chapter_count else 0,
+            "chapters": list(chapters),
+        })
+
+    def post(self, request, pk):
+        serializer = ProgressHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if not can_track(request.user.id, pk, data["chapter"]):
+            raise PermissionDenied("You must enroll to track progress.")
+
+        buffer.record(
+            request.user.id, pk, data["chapter"], data["position"], data["completed"]
+        )
+        return Response({"status": "queued"}, status=202)
+
+
+class ResumeCourseView(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
+
+    def get(self, request, pk):
+        enrollment = Enrollment.objects.filter(
+            user_id=request.user.id, course_id=pk
+        ).values("last_chapter_id", "last_position", "completed_chapters").first()
+
+        if enrollment is None:
+            raise PermissionDenied("You must enroll to access this course.")
+
+        outline = get_outline(pk)
+        completed = set(
+            ChapterProgress.objects.filter(
+                user_id=request.user.id, course_id=pk, completed=True
+            ).values_list("chapter_id", flat=True)
+        )
+
+        # heartbeats still buffered in this process are newer than the rows
+        pending = buffer.pending(request.user.id, pk)
+        completed.update(
+            chapter_id for chapter_id, entry in pending.items() if entry["completed"]
+        )
+        if pending:
+            chapter_id, entry = max(pending.items(), key=lambda item: item[1]["updated_at"])
+            enrollment["last_chapter_id"] = chapter_id
+            enrollment["last_position"] = entry["position"]
+
+        position = resume_position(outline, enrollment["last_chapter_id"], completed)
+        if position is None:
+            return Response({
+                "chapter": None,
+                "resume_position": 0,
+                "previous": outline.at(len(outline) - 1),
+                "next": None,
+                "chapter_count": len(outline),
+            })
+
+        chapter = outline.at(position)
+        resume_at = (
+            enrollment["last_position"]
+            if chapter["id"] == enrollment["last_chapter_id"] else 0
+        )
+
+        return Response({
+            "chapter": chapter,
+            "resume_position": resume_at,
+            "previous": outline.at(position - 1) if position else None,
+            "next": outline.at(position + 1),
+            "chapter_count": len(outline),
+        })
@@ -2,18 +2,26 @@ from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from courses.models import Chapter, Course, Section, Enrollment
 from courses.serializers import (
     SectionSerializer, 
 )
-from django.db import transaction
+from courses import response_cache
+from courses.reorder import parse_id, reorder
 
     
 class CreateSectionView(generics.CreateAPIView):
     serializer_class = SectionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 11
+
+    def get_serializer_context(self):
+        # only the course creator gets past the checks below
+        context = super().get_serializer_context()
+        context["video_access"] = True
+        return context
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -24,35 +32,43 @@ class CreateSectionView(generics.CreateAPIView):
 
         course = get_object_or_404(Course, id=course_id)
 
-        if course.creator != user:
+        if course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         serializer.save(course=course)
 
 class UpdateSectionView(generics.UpdateAPIView):
-    queryset = Section.objects.all()
+    queryset = Section.objects.select_related("course")
     serializer_class = SectionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 10
+
+    def get_serializer_context(self):
+        # only the course creator gets past the checks below
+        context = super().get_serializer_context()
+        context["video_access"] = True
+        return context
 
     def get_object(self):
         section = super().get_object()
         user = self.request.user
 
-        if section.course.creator != user:
+        if section.course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         return section
     
 
 class DeleteSectionView(generics.DestroyAPIView):
-    queryset = Section.objects.all()
+    queryset = Section.objects.select_related("course")
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 16
 
     def get_object(self):
         section = super().get_object()
         user = self.request.user
 
-        if section.course.creator != user:
+        if section.course.creator_id != user.id:
             raise PermissionDenied("You can only modify your own course")
 
         return section
@@ -62,16 +78,37 @@ class DeleteSectionView(generics.DestroyAPIView):
 
 class ReorderSectionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # one more for older clients, whose course is looked up from a section
+    query_budget = 5
 
     def patch(self, request):
         sections = request.data.get("sections", [])
+        course_id = request.data.get("course_id")
+
+        if not isinstance(sections, list):
+            raise ValidationError({"sections": "Expected a list of {id, order} items"})
+
+        if not course_id and sections:
+            # older clients only send the sections; take their course
+            first = sections[0].get("id") if isinstance(sections[0], dict) else None
+            if first is not None:
+                course_id = Section.objects.filter(
+                    id=parse_id(first, "sections")
+                ).values_list("course_id", flat=True).first()
+
+        if not course_id:
+            return Response(
+                {"detail": "course_id is required"},
+                status=400
+            )
+
+        course = get_object_or_404(Course, id=parse_id(course_id, "course_id"))
+
+        if course.creator_id != request.user.id:
+            raise PermissionDenied("You can only modify your own course")
 
-        with transaction.atomic():
-            for item in sections:
-                Section.objects.filter(
-                    id=item["id"],
-                    course__creator=request.user
-                ).update(order=item["order"])
+        order = reorder(Section.objects.filter(course=course), sections)
+        response_cache.schedule_bump(course.id)
 
-        return Response({"status": "reordered"})
+        return Response({"status": "reordered", "sections": order})
 
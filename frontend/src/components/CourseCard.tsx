@@ -50,7 +50,25 @@ function CourseCard({ course, link }: Props) {
       <Card className="h-full overflow-hidden border-slate-200 bg-white hover:shadow-2xl hover:shadow-primary/10 hover:border-primary/20 transition-all duration-500 transform hover:-translate-y-2 active:scale-[0.99] rounded-3xl relative">
         {/* Thumbnail Container */}
         <div className="relative aspect-video w-full overflow-hidden bg-slate-100">
-          {course.thumbnail ? (
+          {course.thumbnails ? (
+            <picture className="block w-full h-full">
+              {course.thumbnails.webp && (
+                <source
+                  type="image/webp"
+                  srcSet={course.thumbnails.webp}
+                  sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+                />
+              )}
+              <img
+                src={course.thumbnails.src}
+                srcSet={course.thumbnails.jpeg}
+                sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
+                alt={course.title}
+                loading="lazy"
+                className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-110"
+              />
+            </picture>
+          ) : course.thumbnail ? (
             <img
               src={course.thumbnail}
               alt={course.title}
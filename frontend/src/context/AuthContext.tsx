@@ -30,7 +30,7 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
 
     try {
       const res = await api.get("/courses/my-enrollments/");
-      const ids = res.data.map((c: any) => c.id);
+      const ids = res.data.results.map((c: any) => c.id);
       setEnrolledCourses(ids);
     } catch (err) {
       console.error("Failed to fetch enrollments");
@@ -144,6 +144,7 @@ function CourseBuilder() {
     setCourse({ ...course, sections: newSections });
 
     await api.patch("/courses/section/reorder/", {
+      course_id: course.id,
       sections: newSections.map((s, index) => ({
         id: s.id,
         order: index + 1,
@@ -22,7 +22,7 @@ function Home() {
         const res = await api.get("/courses/", {
           params: searchQuery ? {search: searchQuery}: {}
         });
-        setCourses(res.data);
+        setCourses(res.data.results);
       } catch (err) {
         console.error("Failed to load courses");
       }
@@ -35,7 +35,7 @@ function MyCourses() {
       try {
         setIsLoading(true);
         const res = await api.get("/courses/my-courses/");
-        setCourses(res.data);
+        setCourses(res.data.results);
       } catch (err) {
         console.error("Failed to load instructor courses");
       } finally {
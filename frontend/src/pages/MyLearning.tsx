@@ -27,7 +27,7 @@ function MyLearning() {
       try {
         setIsLoading(true);
         const res = await api.get("/courses/my-enrollments/");
-        setCourses(res.data);
+        setCourses(res.data.results);
       } catch (err) {
         console.error("Failed to load enrolled courses");
       } finally {
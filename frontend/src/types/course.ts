@@ -1,7 +1,14 @@
+export type Thumbnails = {
+  webp?: string;
+  jpeg: string;
+  src: string;
+};
+
 export type Course = {
   id: number;
   title: string;
   thumbnail: string | null;
+  thumbnails?: Thumbnails | null;
   total_hours: number;
   creator_name: string;
   creator_id?: number;